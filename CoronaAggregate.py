@@ -0,0 +1,157 @@
+import re
+import numpy as np
+import pandas as pd
+
+#
+# shared aggregation of Johns Hopkins (JHU) time series tables used by the 4 producer scripts
+#
+
+# date headers in the raw JHU time series csv come as m/d/yy
+DATE_COLUMN_PATTERN = re.compile(r'^\d{1,2}/\d{1,2}(/\d{2,4})?$')
+
+
+def parse_date_header(columns):
+    """
+    Returns a JHU csv header with every date label turned into a Timestamp, all of them parsed
+    in one to_datetime call; the metadata labels are left as they are.
+    """
+    header = pd.Index(columns, dtype='object')
+    is_date = np.array([isinstance(column, str) and bool(DATE_COLUMN_PATTERN.match(column)) for column in header],
+                       dtype=bool)
+    if not is_date.any():
+        return header
+    labels = header[is_date]
+    try:
+        dates = pd.to_datetime(labels, format='%m/%d/%y')
+    except ValueError:
+        dates = pd.to_datetime(labels, format='mixed')
+    values = header.to_numpy().copy()
+    values[is_date] = list(dates)
+    return pd.Index(values, dtype='object')
+
+
+def date_columns(df):
+    """
+    Returns the list of date columns in a JHU time series table, in file order.
+    Metadata columns (UID, Lat, Long, Combined_Key, Population, ...) are skipped
+    no matter where they sit, so the global and the US layouts both work.
+    Dates are Timestamps once the header went through parse_date_header(), m/d/yy strings before.
+    """
+    return [column for column in df.columns
+            if isinstance(column, pd.Timestamp) or DATE_COLUMN_PATTERN.match(str(column))]
+
+
+def sum_by_region(df, region_column, index_name=None, columns=None):
+    """
+    Sums every date column of `df` per value of `region_column` in one grouped pass.
+    Returns a wide frame with one row per region (first-seen order, like .unique())
+    and one column per date, indexed by `index_name` (defaults to `region_column`),
+    as one int32 block when every total fits (see compact()).
+    """
+    if columns is None:
+        columns = date_columns(df)
+    totals = df.groupby(region_column, sort=False)[columns].sum()
+    # rebuilt from the labels so that Timestamp dates become a DatetimeIndex, not an object index
+    totals.columns = pd.Index(list(totals.columns))
+    totals.index = totals.index.astype(str)
+    totals.index.name = index_name or region_column
+    return compact(totals)
+
+
+def compact_dtype(values):
+    """
+    Returns int32 if every value of the integer array `values` fits in it, else its own dtype.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iu' or values.size == 0:
+        return values.dtype
+    info = np.iinfo('int32')
+    if values.min() >= info.min and values.max() <= info.max:
+        return np.dtype('int32')
+    return values.dtype
+
+
+def compact(df):
+    """
+    Returns an integer frame as int32 if every value fits, so a region x date matrix is a single
+    4 byte per cell block. Sums, diffs and divisions of it come out as int64 / float64 as usual;
+    anything else that could grow the values should go through astype('int64') first.
+    """
+    values = df.to_numpy()
+    dtype = compact_dtype(values)
+    return df if dtype == values.dtype else df.astype(dtype)
+
+
+class CountyRollup:
+    """
+    County -> state reducer for the JHU US time series.
+    The county rows are grouped once into a sorted row index per state, so the
+    whole states x dates matrix comes out of a single np.add.reduceat call.
+    The county x dates matrix stays available for drill-down, as a compact (int32 when it fits)
+    array: the rest of the county table does not need to be kept around.
+    """
+
+    def __init__(self, df, region_column='Province_State', detail_column='Combined_Key', columns=None):
+        if columns is None:
+            columns = date_columns(df)
+        self.columns = pd.Index(list(columns))
+        codes, self.regions = pd.factorize(df[region_column], sort=False)
+        keep = codes >= 0
+        self.codes = codes[keep]
+        values = df.loc[keep, columns].to_numpy()
+        self.values = values.astype(compact_dtype(values), copy=False)
+        self.details = pd.Index(df.loc[keep, detail_column].astype(str), name=detail_column)
+        # rows of each state are contiguous in `order`, starting at `starts`
+        self.order = np.argsort(self.codes, kind='stable')
+        self.counts = np.bincount(self.codes, minlength=len(self.regions))
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+
+    def states(self, index_name='state', columns=None):
+        """
+        Returns the states x dates totals, states in first-seen order,
+        for every date or only for the given date `columns`.
+        """
+        if columns is None:
+            values, columns = self.values, self.columns
+        else:
+            values = self.values[:, self.columns.get_indexer(columns)]
+        # add up in 64 bit whatever the county values are stored in
+        totals = np.add.reduceat(values[self.order], self.starts, axis=0, dtype='int64' if values.dtype.kind in 'iu' else None)
+        return compact(pd.DataFrame(totals, index=pd.Index(self.regions.astype(str), name=index_name), columns=columns))
+
+    def counties(self, state=None):
+        """
+        Returns the county x dates matrix, for every county or only the counties of `state`.
+        """
+        if state is None:
+            rows = self.order
+        else:
+            code = self.regions.get_loc(state)
+            rows = self.order[self.starts[code]:self.starts[code] + self.counts[code]]
+        return pd.DataFrame(self.values[rows], index=self.details[rows], columns=self.columns)
+
+
+def align_time_zero(df, threshold, values=None):
+    """
+    Shifts every region of a dates x regions frame so that day 0 is the first date on which it
+    reached `threshold` (a number, or a per-region Series such as population / 100000 for a
+    per-capita start). Regions that never reach it are left out. Returns a days x regions frame,
+    NaN-padded after each region's last date, built in one preallocated array.
+    With `values` (a frame shaped like `df`, e.g. its per 100k version) the crossing is still
+    found in `df` but the aligned numbers are taken from `values`.
+    """
+    counts = df.to_numpy(dtype='float64')
+    values = counts if values is None else values.reindex(index=df.index, columns=df.columns).to_numpy(dtype='float64')
+    if isinstance(threshold, pd.Series):
+        threshold = threshold.reindex(df.columns).to_numpy(dtype='float64')
+    crossed = counts >= threshold
+    regions = np.flatnonzero(crossed.any(axis=0))
+    first = crossed.argmax(axis=0)[regions]
+    n_dates = values.shape[0]
+    n_days = n_dates - first.min() if len(regions) else 0
+
+    rows = first[np.newaxis, :] + np.arange(n_days)[:, np.newaxis]
+    valid = rows < n_dates
+    aligned = np.full((n_days, len(regions)), np.nan)
+    aligned[valid] = values[rows[valid], np.broadcast_to(regions, rows.shape)[valid]]
+    return pd.DataFrame(aligned, columns=df.columns[regions])
@@ -0,0 +1,249 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from urllib.parse import urlsplit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+#
+# on-disk download cache shared by every script
+#   - files are stored once per content hash (objects/<sha256>), urls point at them from index.json
+#   - a cached url is revalidated with If-None-Match / If-Modified-Since, a 304 costs no download
+#   - CORONA_OFFLINE=1 never touches the network and serves whatever is cached
+#   - entries unused for CORONA_CACHE_MAX_DAYS are dropped, then the least recently used ones
+#     until the cache fits in CORONA_CACHE_MAX_MB
+#   - downloads use one keep-alive session per host, with connect/read timeouts and retries
+#     with exponential backoff on connection errors and 429/5xx answers; bodies are streamed to
+#     disk and gzip/deflate transfer encodings are decoded on the fly
+#   - fetch_many() pulls a list of urls concurrently on CORONA_FETCH_WORKERS threads (default 8)
+#   - a local path (or file:// url), e.g. from a CORONA_DATA_ROOT mirror, is served as it is
+#
+CACHE_DIR = os.environ.get('CORONA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.corona_cache'))
+OFFLINE = os.environ.get('CORONA_OFFLINE', '0') not in ('', '0')
+MAX_BYTES = int(os.environ.get('CORONA_CACHE_MAX_MB', '512')) * 1024 * 1024
+MAX_AGE = float(os.environ.get('CORONA_CACHE_MAX_DAYS', '30')) * 24 * 3600
+FETCH_WORKERS = int(os.environ.get('CORONA_FETCH_WORKERS', '8'))
+# (connect, read) seconds
+TIMEOUT = (10, 60)
+RETRIES = 3
+BACKOFF = 0.5
+
+
+class DownloadCache:
+    """
+    Content-addressed download cache with conditional GET revalidation,
+    an offline mode and size/age based eviction.
+    """
+
+    def __init__(self, directory=CACHE_DIR, offline=OFFLINE, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory
+        self.offline = offline
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.objects = os.path.join(directory, 'objects')
+        self.index_path = os.path.join(directory, 'index.json')
+        os.makedirs(self.objects, exist_ok=True)
+        # index.json is read-modify-written, so the fetch threads take turns on it
+        self.lock = threading.RLock()
+        self.sessions = {}
+        # urls already revalidated by this process are not asked about again
+        self.fresh = set()
+        # why the last fetch of a url came back empty, for the source checks (see CoronaSource.py)
+        self.errors = {}
+
+    def session(self, url):
+        """
+        Returns the pooled keep-alive session of the host of `url`, creating it on first use.
+        """
+        host = urlsplit(url).netloc
+        with self.lock:
+            if host not in self.sessions:
+                retry = Retry(total=RETRIES, backoff_factor=BACKOFF, status_forcelist=[429, 500, 502, 503, 504],
+                              allowed_methods=['GET'], raise_on_status=False)
+                adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=FETCH_WORKERS)
+                session = Session()
+                session.headers['Accept-Encoding'] = 'gzip, deflate'
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+            return self.sessions[host]
+
+    def load_index(self):
+        """
+        Returns the url -> entry map, empty if there is no (readable) index yet.
+        """
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_index(self, index):
+        """
+        Writes the index atomically so a concurrent reader never sees half a file.
+        """
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.json')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=1)
+        os.replace(tmp, self.index_path)
+
+    def object_path(self, sha):
+        return os.path.join(self.objects, sha)
+
+    def cached_path(self, url):
+        """
+        Returns the path of the cached copy of `url`, or None.
+        """
+        entry = self.load_index().get(url)
+        if entry and os.path.exists(self.object_path(entry['sha256'])):
+            return self.object_path(entry['sha256'])
+        return None
+
+    def fetch(self, url, is_good=None, evict=True):
+        """
+        Returns the path of an up to date local copy of `url`, downloading only if the
+        server says the cached copy changed. `is_good(resp)` decides whether a 200
+        response is usable. Returns None (and logs) when nothing usable is available.
+        """
+        self.errors.pop(url, None)
+        path = local_path(url)
+        if path is not None:
+            if os.path.isfile(path):
+                return path
+            self.errors[url] = 'no such file'
+            print('No such file {0}'.format(path))
+            return None
+        entry = self.load_index().get(url)
+        cached = self.cached_path(url)
+        if self.offline or (url in self.fresh and cached is not None):
+            if cached is None:
+                self.errors[url] = 'offline and not cached'
+                print('Offline and no cached copy of {0}'.format(url))
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            with closing(self.session(url).get(url, headers=headers, stream=True, timeout=TIMEOUT)) as resp:
+                if resp.status_code == 304 and cached is not None:
+                    entry['used'] = time.time()
+                    self.update_index(url, entry)
+                    self.fresh.add(url)
+                    return cached
+                if resp.status_code != 200 or (is_good is not None and not is_good(resp)):
+                    self.errors[url] = 'unexpected response: {0} {1}'.format(
+                        resp.status_code, resp.headers.get('Content-Type'))
+                    print('Unexpected response from {0} : {1} {2}'.format(
+                        url, resp.status_code, resp.headers.get('Content-Type')))
+                    return None
+                sha = self.store(resp)
+                entry = {'sha256': sha,
+                         'etag': resp.headers.get('ETag'),
+                         'last_modified': resp.headers.get('Last-Modified'),
+                         'content_type': resp.headers.get('Content-Type'),
+                         'size': os.path.getsize(self.object_path(sha)),
+                         'stored': time.time(),
+                         'used': time.time()}
+        except RequestException as e:
+            self.errors[url] = 'request failed: ' + str(e)
+            print('Error during requests to {0} : {1}'.format(url, str(e)))
+            if cached is not None:
+                print('Using cached copy of {0}'.format(url))
+            return cached
+
+        self.update_index(url, entry)
+        self.fresh.add(url)
+        if evict:
+            self.evict()
+        return self.object_path(sha)
+
+    def fetch_many(self, requests, workers=FETCH_WORKERS):
+        """
+        Fetches every (url, is_good) of `requests` concurrently, evicting once at the end.
+        Returns {url: path or None}.
+        """
+        requests = list(requests)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(requests)))) as pool:
+            paths = list(pool.map(lambda request: self.fetch(request[0], request[1], evict=False), requests))
+        if not self.offline:
+            self.evict()
+        return {url: path for (url, _), path in zip(requests, paths)}
+
+    def store(self, resp):
+        """
+        Streams the (decoded) response body into objects/<sha256> and returns the hash.
+        """
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self.objects, suffix='.part')
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in resp.iter_content(chunk_size=1 << 16):
+                digest.update(chunk)
+                f.write(chunk)
+        sha = digest.hexdigest()
+        os.replace(tmp, self.object_path(sha))
+        return sha
+
+    def update_index(self, url, entry):
+        # re-read so entries written meanwhile by another script are kept
+        with self.lock:
+            index = self.load_index()
+            index[url] = entry
+            self.save_index(index)
+
+    def evict(self, now=None):
+        """
+        Drops entries unused for longer than max_age, then the least recently used ones
+        until the cache fits in max_bytes, and deletes objects no entry points at.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            index = self.load_index()
+            index = {url: entry for url, entry in index.items() if now - entry['used'] <= self.max_age}
+            # objects are shared between urls with identical content, so count each one once
+            by_recent_use = sorted(index.items(), key=lambda item: item[1]['used'], reverse=True)
+            kept, sizes = {}, {}
+            for url, entry in by_recent_use:
+                sha = entry['sha256']
+                if sha not in sizes and sum(sizes.values()) + entry['size'] > self.max_bytes:
+                    continue
+                sizes[sha] = entry['size']
+                kept[url] = entry
+            self.save_index(kept)
+            for name in os.listdir(self.objects):
+                path = os.path.join(self.objects, name)
+                # leave fresh files alone, another script may be about to index them
+                if name not in sizes and now - os.path.getmtime(path) > 3600:
+                    os.remove(path)
+
+
+def local_path(url):
+    """
+    Returns the file path of a local `url` (a plain path or a file:// url), None for http(s) urls.
+    """
+    if url.startswith(('http://', 'https://')):
+        return None
+    return url[len('file://'):] if url.startswith('file://') else url
+
+
+_cache = None
+
+
+def download_cache():
+    """
+    Returns the process wide DownloadCache configured from the CORONA_* environment variables.
+    """
+    global _cache
+    if _cache is None:
+        _cache = DownloadCache()
+    return _cache
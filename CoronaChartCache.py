@@ -0,0 +1,141 @@
+import hashlib
+import io
+import os
+import tempfile
+from collections import OrderedDict
+import matplotlib.pyplot as plt
+
+#
+# rendered chart cache
+#   chart images (png, svg, ...) are kept as bytes under a key of (chart type, region, scale,
+#   data date, hash of the region's data), in two LRU tiers:
+#       memory    per process, up to CORONA_CHART_CACHE_MEMORY_MB (default 64)
+#       disk      one file per key in CORONA_CHART_CACHE_DIR (default <CORONA_CACHE_DIR>/charts),
+#                 up to CORONA_CHART_CACHE_MAX_MB (default 256), shared by every process; a hit
+#                 touches the file, eviction drops the least recently touched files first
+#   since the key holds the region's own data, a JHU update only misses for the regions whose
+#   numbers it changed; the entries of the others stay valid.
+#
+CHART_CACHE_DIR = os.environ.get('CORONA_CHART_CACHE_DIR',
+                                 os.path.join(os.environ.get('CORONA_CACHE_DIR',
+                                                             os.path.join(os.path.expanduser('~'), '.corona_cache')),
+                                              'charts'))
+MEMORY_BYTES = int(os.environ.get('CORONA_CHART_CACHE_MEMORY_MB', '64')) * 1024 * 1024
+DISK_BYTES = int(os.environ.get('CORONA_CHART_CACHE_MAX_MB', '256')) * 1024 * 1024
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf'}
+
+
+def chart_key(chart, region, scale, data_df):
+    """
+    Returns the cache key of a chart of `region` drawn from `data_df` (dates x metrics of that region only).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\x1f'.join(str(label) for label in data_df.index).encode())
+    digest.update('\x1f'.join(str(label) for label in data_df.columns).encode())
+    digest.update(data_df.to_numpy(dtype='float64').tobytes())
+    data_date = str(data_df.index[-1]) if len(data_df.index) else ''
+    return (chart, region, scale, data_date, digest.hexdigest())
+
+
+def figure_bytes(figure, fmt):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=fmt, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+class ChartCache:
+    """
+    Two tier (memory, disk) LRU cache of rendered chart images.
+    """
+
+    def __init__(self, directory=CHART_CACHE_DIR, memory_bytes=MEMORY_BYTES, disk_bytes=DISK_BYTES):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        self.disk_written = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key, fmt):
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name + '.' + fmt)
+
+    def remember(self, key, fmt, data):
+        if len(data) > self.memory_bytes:
+            return
+        entry = (key, fmt)
+        if entry in self.memory:
+            self.memory_size -= len(self.memory.pop(entry))
+        self.memory[entry] = data
+        self.memory_size += len(data)
+        while self.memory_size > self.memory_bytes:
+            self.memory_size -= len(self.memory.popitem(last=False)[1])
+
+    def get(self, key, fmt):
+        """
+        Returns the cached image bytes, or None.
+        """
+        entry = (key, fmt)
+        if entry in self.memory:
+            self.memory.move_to_end(entry)
+            return self.memory[entry]
+        path = self.path(key, fmt)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self.remember(key, fmt, data)
+        return data
+
+    def put(self, key, fmt, data):
+        self.remember(key, fmt, data)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, self.path(key, fmt))
+        self.disk_written += len(data)
+        # scanning the directory is only worth it once a good part of the budget was written
+        if self.disk_written > self.disk_bytes // 8:
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used files until the disk tier fits in its budget.
+        """
+        self.disk_written = 0
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in files)
+        for _, size, name in sorted(files):
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def charts(self, key, formats, build):
+        """
+        Returns {format: image bytes} for `key`, calling `build()` for the figure (once, then closed)
+        only if one of the formats is not cached yet.
+        """
+        images = {fmt: self.get(key, fmt) for fmt in formats}
+        missing = [fmt for fmt, data in images.items() if data is None]
+        if missing:
+            figure = build()
+            for fmt in missing:
+                images[fmt] = figure_bytes(figure, fmt)
+                self.put(key, fmt, images[fmt])
+            plt.close(figure)
+        return images
@@ -0,0 +1,221 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.artist import Artist
+from matplotlib.collections import LineCollection
+from matplotlib.text import Text
+from matplotlib.ticker import Formatter, MaxNLocator
+from matplotlib.transforms import Bbox, IdentityTransform
+
+#
+# shared chart building blocks for the producer scripts
+#   line_chart() draws every region of a dates x regions frame as one LineCollection. series longer
+#   than the axes is wide in pixels are first thinned with Largest-Triangle-Three-Buckets, which keeps
+#   the peaks and turns, and the date ticks are picked to fit the width instead of one per day.
+#   CORONA_LOG_SCALE=1 draws the line charts on a log y axis (zeros and negatives are left out).
+#
+LOG_SCALE = os.environ.get('CORONA_LOG_SCALE', '0') not in ('', '0')
+
+
+def date_labels(index):
+    """
+    Returns the tick labels of a date axis: m/d/yy for real dates (unique across years), else the labels as text.
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return index.strftime('%m/%d/%y').tolist()
+    return [str(label) for label in index]
+
+
+def end_labels(df, name_column, how='max'):
+    """
+    Returns the end-of-line label table (name, x, y) for a dates x regions frame in one
+    column-wise operation: y is each column's max (how='max') or last valid value (how='last'),
+    x is one past the last date, like the per-row loops used to build it.
+    """
+    if how == 'max':
+        y = df.max()
+    else:
+        y = df.ffill().iloc[-1]
+    return pd.DataFrame({name_column: df.columns, 'x': len(df), 'y': y.to_numpy()})
+
+
+class EndLabels(Artist):
+    """
+    All end-of-line labels of a chart as one artist.
+    At draw time the labels are sorted by height in screen space and pushed apart so that
+    no two are closer than one line of text, without leaving the height of the axes; when
+    there are more labels than lines of text fit, the lowest ones are left out. They are then
+    drawn with a single reused Text.
+    """
+
+    zorder = 3
+
+    def __init__(self, x, y, labels, fontsize=8, spacing=1.1):
+        super().__init__()
+        keep = ~np.isnan(np.asarray(y, dtype='float64'))
+        self.x = np.broadcast_to(np.asarray(x, dtype='float64'), keep.shape)[keep]
+        self.y = np.asarray(y, dtype='float64')[keep]
+        self.labels = [str(label) for label, kept in zip(labels, keep) if kept]
+        self.fontsize = fontsize
+        self.spacing = spacing
+        self.text = Text(fontsize=fontsize, ha='left', va='center')
+        self.text.set_transform(IdentityTransform())
+        # labels sit right of the last date, outside the axes, like the annotations they replace
+        self.set_clip_on(False)
+
+    def layout(self, renderer):
+        """
+        Returns (display coordinates, shown) of every label after overlap resolution; `shown`
+        is False for the labels that did not fit.
+        """
+        points = self.axes.transData.transform(np.column_stack((self.x, self.y)))
+        gap = renderer.points_to_pixels(self.fontsize) * self.spacing
+        low, high = self.axes.bbox.y0 + gap / 2, self.axes.bbox.y1 - gap / 2
+        fit = max(int((high - low) // gap) + 1, 0) if high >= low else 0
+        # the highest lines keep their labels when they do not all fit
+        order = np.argsort(points[:, 1], kind='stable')[max(len(points) - fit, 0):]
+        shown = np.zeros(len(points), dtype=bool)
+        shown[order] = True
+        if not len(order):
+            return points, shown
+        # label i (from the bottom) of the stack can sit between low + i gaps and high - (n - 1 - i)
+        # gaps; with the steps taken out that is the same [low, high - (n - 1) gaps] for all of them.
+        # pushing every label up (or down) just enough to clear its neighbour both keep the order
+        # and the spacing, and so does their average, which keeps the stack centred on the lines
+        steps = np.arange(len(order)) * gap
+        shifted = np.clip(points[order, 1] - steps, low, high - steps[-1])
+        up = np.maximum.accumulate(shifted)
+        down = np.minimum.accumulate(shifted[::-1])[::-1]
+        points[order, 1] = (up + down) / 2 + steps
+        return points, shown
+
+    def placed(self, renderer):
+        """
+        Yields (x, y, label) in display coordinates for every label that is drawn.
+        """
+        points, shown = self.layout(renderer)
+        for (x, y), label, visible in zip(points, self.labels, shown):
+            if visible:
+                yield x, y, label
+
+    def draw(self, renderer):
+        if not self.get_visible() or not len(self.labels):
+            return
+        self.text.set_figure(self.figure)
+        for x, y, label in self.placed(renderer):
+            self.text.set_position((x, y))
+            self.text.set_text(label)
+            self.text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        if renderer is None:
+            renderer = self.figure.canvas.get_renderer()
+        if not len(self.labels):
+            return Bbox.null()
+        self.text.set_figure(self.figure)
+        boxes = []
+        for x, y, label in self.placed(renderer):
+            self.text.set_position((x, y))
+            self.text.set_text(label)
+            boxes.append(self.text.get_window_extent(renderer))
+        return Bbox.union(boxes) if boxes else Bbox.null()
+
+
+def draw_end_labels(ax, line_labels, fontsize=8):
+    """
+    Adds the labels of an end_labels() table to `ax` as one EndLabels artist.
+    """
+    y = line_labels['y'].to_numpy(dtype='float64')
+    if ax.get_yscale() == 'log':
+        y = np.where(y > 0, y, np.nan)
+    artist = EndLabels(line_labels['x'].to_numpy(), y, line_labels.iloc[:, 0], fontsize=fontsize)
+    ax.add_artist(artist)
+    artist.set_clip_on(False)
+    return artist
+
+
+class IndexFormatter(Formatter):
+    """
+    Labels an integer position tick with the index label at that position (a plain class rather
+    than a FuncFormatter lambda, so the figures can be pickled for headless rendering).
+    """
+
+    def __init__(self, labels):
+        self.labels = labels
+
+    def __call__(self, x, pos=None):
+        if x == int(x) and 0 <= int(x) < len(self.labels):
+            return self.labels[int(x)]
+        return ''
+
+
+def lttb_rows(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of every column of a dates x series array at once.
+    Returns a (threshold x series) array of the rows kept for each series, the first and last
+    date included. All series share the buckets, so each bucket is one vectorized step.
+    """
+    n_rows, n_series = values.shape
+    if threshold >= n_rows or threshold < 3:
+        return np.repeat(np.arange(n_rows)[:, np.newaxis], n_series, axis=1)
+    series = np.arange(n_series)
+    every = (n_rows - 2) / (threshold - 2)
+    rows = np.zeros((threshold, n_series), dtype='int64')
+    rows[-1] = n_rows - 1
+    previous = rows[0]
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        # the third corner of the triangle is the average of the next bucket (the last point for the last one)
+        next_end = min(int((bucket + 2) * every) + 1, n_rows)
+        if bucket == threshold - 3:
+            next_x, next_y = n_rows - 1, values[-1]
+        else:
+            next_x = (end + next_end - 1) / 2
+            with warnings.catch_warnings():
+                # a bucket where a series has no data (past its end) averages to NaN
+                warnings.simplefilter('ignore', RuntimeWarning)
+                next_y = np.nanmean(values[end:next_end], axis=0)
+        prev_x, prev_y = previous, values[previous, series]
+        candidate_x = np.arange(start, end)[:, np.newaxis]
+        area = np.abs((prev_x - next_x) * (values[start:end] - prev_y) - (prev_x - candidate_x) * (next_y - prev_y))
+        area[np.isnan(area)] = -1
+        previous = start + area.argmax(axis=0)
+        rows[bucket + 1] = previous
+    return rows
+
+
+def line_chart(df, log=LOG_SCALE, max_points=None):
+    """
+    Draws every column of a dates x regions frame on a new figure as a single LineCollection and
+    returns the axes. Each series keeps at most `max_points` points (default: the axes width in pixels).
+    """
+    fig, ax = plt.subplots()
+    values = df.to_numpy(dtype='float64')
+    if log:
+        values = np.where(values > 0, values, np.nan)
+    if max_points is None:
+        max_points = max(int(ax.bbox.width), 3)
+    rows = lttb_rows(values, max_points)
+    points = np.take_along_axis(values, rows, axis=0)
+
+    segments = []
+    for column in range(values.shape[1]):
+        keep = ~np.isnan(points[:, column])
+        segments.append(np.column_stack((rows[keep, column], points[keep, column])))
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    ax.add_collection(LineCollection(segments, colors=[colors[i % len(colors)] for i in range(len(segments))],
+                                     linewidths=1.5))
+    if log:
+        ax.set_yscale('log')
+    ax.autoscale_view()
+    ax.set_xlim(0, max(len(df) - 1, 1))
+
+    labels = date_labels(df.index)
+    ax.xaxis.set_major_locator(MaxNLocator(nbins='auto', integer=True))
+    ax.xaxis.set_major_formatter(IndexFormatter(labels))
+    ax.tick_params(axis='x', labelrotation=90, labelsize='small')
+    return ax
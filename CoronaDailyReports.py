@@ -0,0 +1,114 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from CoronaAggregate import compact_dtype
+from CoronaCache import download_cache
+from CoronaSource import (DAILY_REPORT_COUNT_COLUMNS, SourceError, daily_report_url, is_good_response,
+                          latest_daily_report_day, parse_jhu_csv)
+
+#
+# multi-day loader for csse_covid_19_daily_reports
+#   the daily reports changed schema over time: early ones (until 03-21-2020) say Country/Region,
+#   Province/State, Last Update and Latitude/Longitude, later ones Country_Region, Province_State,
+#   Last_Update and Lat/Long_, with Active and Recovered not always there. normalize_report() maps
+#   every era onto the current names, so the scripts only ever see Country_Region.
+#   load_daily_reports() downloads a range of days at once (see CoronaCache.fetch_many), parses the
+#   files on a process pool and stacks them into one table indexed by (date, region).
+#       CORONA_REPORT_WORKERS   parsing processes (default: number of cpus)
+#       CORONA_REPORT_LOOKBACK  days to go back when the latest report is not published yet (default 7)
+#
+REPORT_WORKERS = int(os.environ.get('CORONA_REPORT_WORKERS', str(os.cpu_count() or 1)))
+COLUMN_RENAMES = {'Country/Region': 'Country_Region', 'Province/State': 'Province_State',
+                  'Last Update': 'Last_Update', 'Latitude': 'Lat', 'Longitude': 'Long_'}
+
+
+def normalize_report(df):
+    """
+    Returns a daily report with the current column names, and every count column present (0 if missing).
+    """
+    df = df.rename(columns=COLUMN_RENAMES)
+    for column in DAILY_REPORT_COUNT_COLUMNS:
+        if column not in df.columns:
+            df[column] = 0
+    return df
+
+
+def parse_report(path):
+    """
+    Parses one downloaded daily report into a normalized frame (runs in the worker processes).
+    """
+    with open(path, 'rb') as f:
+        return normalize_report(parse_jhu_csv(f, DAILY_REPORT_COUNT_COLUMNS))
+
+
+def read_daily_report(day):
+    """
+    Returns the normalized daily report of `day`. Raises SourceError if it cannot be fetched.
+    """
+    url = daily_report_url(day)
+    path = download_cache().fetch(url, is_good=lambda resp: is_good_response(resp, expected='text'))
+    if path is None:
+        raise SourceError(url, download_cache().errors.get(url, 'not fetched'))
+    return parse_report(path)
+
+
+def latest_daily_report(day=None):
+    """
+    Returns (day, normalized report) of the latest published daily report, `day` (yesterday) or before.
+    """
+    day = latest_daily_report_day(day)
+    return day, read_daily_report(day)
+
+
+def stack_reports(reports, region_column='Country_Region'):
+    """
+    Sums every {date: report} by region and stacks them into one table indexed by (date, region),
+    with the count columns as the smallest integer type that holds them.
+    """
+    frames = [report.groupby(region_column, sort=True)[DAILY_REPORT_COUNT_COLUMNS].sum()
+              for report in reports.values()]
+    if not frames:
+        index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), pd.Index([], dtype=object)],
+                                          names=['date', region_column])
+        return pd.DataFrame(columns=DAILY_REPORT_COUNT_COLUMNS, index=index, dtype='int64')
+    table = pd.concat(frames, keys=pd.DatetimeIndex(list(reports), name='date'), names=['date', region_column])
+    return table.astype(compact_dtype(table.to_numpy()))
+
+
+def load_daily_reports(start, end=None, region_column='Country_Region', workers=REPORT_WORKERS):
+    """
+    Returns the (date, region) table of the daily reports from `start` to `end` (both included,
+    `end` defaults to `start`). Days without a published report are skipped and printed.
+    """
+    days = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end if end is not None else start).normalize())
+    paths = download_cache().fetch_many(
+        [(daily_report_url(day), lambda resp: is_good_response(resp, expected='text')) for day in days])
+    available = [(day, paths[daily_report_url(day)]) for day in days if paths[daily_report_url(day)] is not None]
+    missing = [day for day in days if paths[daily_report_url(day)] is None]
+    if missing:
+        print('No daily report for ' + ', '.join('{0:%m-%d-%Y}'.format(day) for day in missing))
+
+    if len(available) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(available))) as pool:
+            reports = list(pool.map(parse_report, [path for _, path in available]))
+    else:
+        reports = [parse_report(path) for _, path in available]
+    return stack_reports({day: report for (day, _), report in zip(available, reports)}, region_column)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stack a range of JHU daily reports into one (date, region) table.')
+    parser.add_argument('start', help='first day, e.g. 2020-03-01')
+    parser.add_argument('end', nargs='?', help='last day (default: start)')
+    parser.add_argument('--region', default='Country_Region', help='column to sum by, e.g. Province_State')
+    parser.add_argument('--workers', type=int, default=REPORT_WORKERS)
+    parser.add_argument('--out', default='DailyReports.csv', help='csv file to write')
+    args = parser.parse_args()
+    table = load_daily_reports(args.start, args.end, args.region, args.workers)
+    table.to_csv(args.out, date_format='%Y-%m-%d')
+    print('{0} rows for {1} days written to {2}'.format(len(table), table.index.get_level_values('date').nunique(), args.out))
+
+
+if __name__ == '__main__':
+    main()
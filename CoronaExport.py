@@ -0,0 +1,90 @@
+import atexit
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+#
+# export registry for the intermediate spreadsheets the scripts can write
+#   every export has a name (the .xlsx file name without extension) and is only written
+#   when switched on for the run through CORONA_EXPORTS:
+#       CORONA_EXPORTS=none                               (default) write nothing
+#       CORONA_EXPORTS=all                                write everything, like the scripts used to
+#       CORONA_EXPORTS=CountryTotals,DifferenceTranspose  write just these
+#   enabled exports are written by background writer threads so they do not hold up the
+#   analysis; the process waits for pending writes before it exits. names in CORONA_EXPORTS
+#   that no export of the run was called (a typo, e.g. CountryTotal) are printed at the end.
+#
+EXPORTS = os.environ.get('CORONA_EXPORTS', 'none')
+WRITERS = int(os.environ.get('CORONA_EXPORT_WRITERS', '2'))
+
+# every export name seen this run -> True if it was written
+registry = {}
+_pool = None
+_pending = []
+
+
+def selected(exports=None):
+    """
+    Returns the names listed in CORONA_EXPORTS (or `exports`).
+    """
+    exports = EXPORTS if exports is None else exports
+    return [item.strip() for item in exports.split(',') if item.strip()]
+
+
+def enabled(name, exports=None):
+    """
+    Returns True if the export called `name` is switched on for this run.
+    """
+    names = selected(exports)
+    if 'all' in names:
+        return True
+    return name in names
+
+
+def unknown(names=None, exports=None):
+    """
+    Returns the names selected in CORONA_EXPORTS that are not among `names` (default: every
+    export seen this run), i.e. that nothing exported.
+    """
+    names = registry if names is None else names
+    return [name for name in selected(exports) if name not in ('all', 'none') and name not in names]
+
+
+def report_unknown(names=None):
+    missing = unknown(names)
+    if missing:
+        print('CORONA_EXPORTS names nothing exported (misspelled?): ' + ', '.join(missing))
+
+
+def report():
+    # only a process that ran a script has seen its exports
+    if registry:
+        report_unknown()
+
+
+def export(name, df, **kwargs):
+    """
+    Registers the export `name` and, if it is switched on, queues `df` to be written to
+    <name>.xlsx (extra keyword arguments go to DataFrame.to_excel). The frame is copied
+    first, so the caller can keep changing it.
+    """
+    global _pool
+    registry[name] = enabled(name)
+    if not registry[name]:
+        return None
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=WRITERS, thread_name_prefix='export')
+    future = _pool.submit(df.copy().to_excel, name + '.xlsx', **kwargs)
+    _pending.append(future)
+    return future
+
+
+def wait():
+    """
+    Blocks until every queued export is written and re-raises the first write error.
+    """
+    while _pending:
+        _pending.pop(0).result()
+
+
+atexit.register(report)
+atexit.register(wait)
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from CoronaAggregate import date_columns
+
+#
+# incremental daily update mode
+#   JHU appends one date column per day (and now and then revises older ones).
+#   With CORONA_INCREMENTAL=1 the aggregated region x date totals, the daily new counts and
+#   their 7 day averages of the previous run are kept in CORONA_STATE_DIR, together with a
+#   hash of every raw date column. The next run only aggregates the columns whose hash is new
+#   or different and only recomputes daily counts / averages from the first changed date on.
+#   the state of a series is kept per producer script (<producer>.<series>.pkl), as the
+#   pipeline runs the scripts that read the same series at the same time.
+#
+INCREMENTAL = os.environ.get('CORONA_INCREMENTAL', '0') not in ('', '0')
+STATE_DIR = os.environ.get('CORONA_STATE_DIR', 'corona_state')
+AVERAGE_WINDOW = 7
+
+
+def column_hashes(df, columns):
+    """
+    Returns a date column -> hash map of the raw values in each column.
+    """
+    return {column: hashlib.blake2b(np.ascontiguousarray(df[column].to_numpy()).tobytes(), digest_size=16).hexdigest()
+            for column in columns}
+
+
+def rows_hash(df, region_column):
+    """
+    Returns a hash of the region column, which changes whenever rows are added, dropped or reordered.
+    """
+    return hashlib.blake2b('\x1f'.join(df[region_column].astype(str)).encode(), digest_size=16).hexdigest()
+
+
+def daily_and_average(totals, previous_daily=None, previous_average=None, start=0):
+    """
+    Returns (daily, average): daily new counts (totals.diff along dates, first date NaN) and
+    their trailing 7 day mean. Columns before position `start` are taken from the previous
+    frames, so only the changed tail of the date axis is recomputed.
+    """
+    values = totals.to_numpy(dtype='float64')
+    n_dates = values.shape[1]
+    if previous_daily is None or start <= 0:
+        start = 0
+        daily = np.full(values.shape, np.nan)
+        average = np.full(values.shape, np.nan)
+    else:
+        daily = previous_daily.reindex(index=totals.index, columns=totals.columns).to_numpy(dtype='float64', copy=True)
+        average = previous_average.reindex(index=totals.index, columns=totals.columns).to_numpy(dtype='float64', copy=True)
+
+    first_diff = max(start, 1)
+    daily[:, first_diff:] = values[:, first_diff:] - values[:, first_diff - 1:n_dates - 1]
+
+    # trailing window sums from a running sum over just the part of the axis the changed tail needs
+    lo = max(start - AVERAGE_WINDOW + 1, 1)
+    window = daily[:, lo:]
+    running = np.concatenate((np.zeros((window.shape[0], 1)), np.cumsum(window, axis=1)), axis=1)
+    positions = np.arange(max(start, AVERAGE_WINDOW), n_dates)
+    right = positions - lo + 1
+    average[:, positions] = (running[:, right] - running[:, right - AVERAGE_WINDOW]) / AVERAGE_WINDOW
+
+    return (pd.DataFrame(daily, index=totals.index, columns=totals.columns),
+            pd.DataFrame(average, index=totals.index, columns=totals.columns))
+
+
+class IncrementalSeries:
+    """
+    Persisted aggregates of one JHU time series (e.g. 'confirmed_global') as read by `producer`
+    (the script name). update() returns the region x date totals and keeps .daily and .average
+    up to date. With incremental mode off it simply aggregates everything and stores nothing.
+    """
+
+    def __init__(self, name, producer=None, enabled=INCREMENTAL, directory=STATE_DIR):
+        self.name = name
+        self.enabled = enabled
+        self.path = os.path.join(directory, (producer + '.' if producer else '') + name + '.pkl')
+        self.daily = None
+        self.average = None
+
+    def load(self):
+        if not self.enabled or not os.path.exists(self.path):
+            return None
+        return pd.read_pickle(self.path)
+
+    def save(self, state):
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        # a temporary file of its own, so concurrent saves never rename each other's file away
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pd.to_pickle(state, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def update(self, df, region_column, aggregate, columns=None):
+        """
+        Aggregates the raw table `df` into region x date totals. `aggregate(columns)` must
+        return the totals for the given date columns (e.g. a sum_by_region or
+        CountyRollup.states call); it is only called for new or revised dates.
+        """
+        if columns is None:
+            columns = date_columns(df)
+        hashes = column_hashes(df, columns)
+        rows = rows_hash(df, region_column)
+        state = self.load()
+
+        if state is None or state['rows'] != rows:
+            changed = list(columns)
+            totals = aggregate(changed)
+            previous_daily = previous_average = None
+        else:
+            changed = [column for column in columns if state['hashes'].get(column) != hashes[column]]
+            changed_set = set(changed)
+            kept = [column for column in columns if column not in changed_set]
+            totals = state['totals'][kept]
+            if changed:
+                totals = pd.concat([totals, aggregate(changed)], axis=1)[list(columns)]
+            previous_daily, previous_average = state['daily'], state['average']
+
+        start = min((totals.columns.get_loc(column) for column in changed), default=len(columns))
+        self.daily, self.average = daily_and_average(totals, previous_daily, previous_average, start)
+        print('{0}: {1} of {2} date columns new or revised'.format(self.name, len(changed), len(columns)))
+
+        if self.enabled:
+            self.save({'rows': rows, 'hashes': hashes, 'totals': totals,
+                       'daily': self.daily, 'average': self.average})
+        return totals
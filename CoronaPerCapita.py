@@ -0,0 +1,49 @@
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+
+#
+# per 100k population mode
+#   every time series a producer aggregates (region x date cumulative totals, daily new counts
+#   and their 7 day averages) is also divided by population / 100000, once, right after
+#   aggregation, and the per 100k matrices are shared by all the charts of the script.
+#   with CORONA_PER_100K=1 the line charts (and NationTrend.py) plot the per 100k numbers
+#   instead of the raw counts; time zero is still the day the raw count crossed its threshold.
+#   populations come from CoronaRegions.py (countries and states).
+#
+PER_100K = os.environ.get('CORONA_PER_100K', '0') not in ('', '0')
+PER = 100000
+
+# axis label suffix of the charts
+UNIT = ' per 100k' if PER_100K else ''
+
+PerCapita = namedtuple('PerCapita', ['cumulative', 'daily', 'average'])
+
+
+def per_100k(matrix, population):
+    """
+    Returns a region x date `matrix` divided by population / 100000 in one broadcast divide.
+    `population` is a Series indexed by region; regions without one (or with 0) come out as NaN rows.
+    """
+    divisor = population.reindex(matrix.index).to_numpy(dtype='float64') / PER
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = matrix.to_numpy(dtype='float64') / divisor[:, np.newaxis]
+    values[~(divisor > 0)] = np.nan
+    return pd.DataFrame(values, index=matrix.index, columns=matrix.columns)
+
+
+def per_100k_series(series, totals, population):
+    """
+    Returns the PerCapita (cumulative, daily, average) matrices of an IncrementalSeries,
+    given the totals its update() returned.
+    """
+    return PerCapita(per_100k(totals, population), per_100k(series.daily, population),
+                     per_100k(series.average, population))
+
+
+def chart_frame(counts, normalized):
+    """
+    Returns the frame the charts should plot in this run: `normalized` in per 100k mode, else `counts`.
+    """
+    return normalized if PER_100K else counts
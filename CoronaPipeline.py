@@ -0,0 +1,126 @@
+import argparse
+import os
+import runpy
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import CoronaCache
+from CoronaSource import pipeline_inputs, require_inputs
+
+#
+# single entry point for the nightly run
+#   fetch       pull every remote input into the download cache once and check it; a bad input
+#               raises a SourceError that stops the run before any producer starts
+#   producers   the 4 producer scripts, in parallel worker processes that read the inputs
+#               from the shared cache (offline, no second download)
+#   trend       NationTrend.py in batch mode (every country and US state), once the producers
+#               have written its artifacts
+#
+HERE = os.path.dirname(os.path.abspath(__file__))
+PRODUCERS = ['GlobalCoronaDailyInfections.py', 'GlobalCoronaDailyDeaths.py',
+             'USCoronaDailyInfections.py', 'USCoronaDailyDeaths.py']
+
+# local stages run in this process, the others on the process pool
+Stage = namedtuple('Stage', ['name', 'run', 'deps', 'local'])
+
+
+def run_script(script):
+    """
+    Runs one of the scripts as if started from the command line, then waits for its queued
+    exports and charts: worker processes exit without running the atexit hooks that would.
+    Returns the names of the exports the worker has seen (see CoronaExport.registry).
+    """
+    try:
+        runpy.run_path(os.path.join(HERE, script), run_name='__main__')
+    finally:
+        # imported here, after main() has set CORONA_RENDER_DIR, which CoronaRender reads on import
+        import CoronaExport
+        import CoronaRender
+        # the render pool must be shut down even if an export failed, or the worker cannot exit
+        try:
+            CoronaExport.wait()
+        finally:
+            CoronaRender.finish()
+    return list(CoronaExport.registry)
+
+
+def init_worker():
+    """
+    Producer workers never open a window (see CoronaRender.py for writing the charts to files)
+    and read their inputs from the shared cache only.
+    """
+    os.environ['MPLBACKEND'] = 'Agg'
+    CoronaCache._cache = CoronaCache.DownloadCache(offline=True)
+
+
+def fetch_inputs():
+    require_inputs(pipeline_inputs())
+
+
+def run_trend():
+    import NationTrend
+    NationTrend.main(['--regions', 'all', '--states', 'all'])
+
+
+def pipeline_stages(with_trend=True):
+    """
+    Returns the stage DAG of the nightly run.
+    """
+    stages = [Stage('fetch', fetch_inputs, [], True)]
+    stages += [Stage(script, script, ['fetch'], False) for script in PRODUCERS]
+    if with_trend:
+        stages.append(Stage('NationTrend.py', run_trend, PRODUCERS, True))
+    return stages
+
+
+def run_dag(stages, workers):
+    """
+    Runs every stage once all of its dependencies are done: local stages in this process,
+    the others (script names) as soon as a worker process is free.
+    A failing stage stops the run before anything that depends on it starts.
+    Returns {stage name: what its run returned}.
+    """
+    done, running, results = set(), {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        while len(done) < len(stages):
+            for stage in stages:
+                if stage.name in done or stage.name in running.values() or not set(stage.deps) <= done:
+                    continue
+                if stage.local:
+                    started = time.time()
+                    results[stage.name] = stage.run()
+                    print('{0} done in {1:.1f}s'.format(stage.name, time.time() - started))
+                    done.add(stage.name)
+                else:
+                    running[pool.submit(run_script, stage.run)] = stage.name
+            if not running:
+                if len(done) < len(stages) and not any(set(stage.deps) <= done for stage in stages if stage.name not in done):
+                    raise ValueError('stages with unknown dependencies: ' +
+                                     ', '.join(stage.name for stage in stages if stage.name not in done))
+                continue
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                results[name] = future.result()
+                print(name + ' done')
+                done.add(name)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the 4 producer scripts in parallel, then NationTrend.py.')
+    parser.add_argument('--workers', type=int, default=len(PRODUCERS), help='producer worker processes')
+    parser.add_argument('--no-trend', action='store_true', help='stop after the producer scripts')
+    # the workers have no display, so the charts always go to files
+    parser.add_argument('--render-dir', default=os.environ.get('CORONA_RENDER_DIR') or 'charts',
+                        help='directory every chart is written to (default: CORONA_RENDER_DIR or charts)')
+    args = parser.parse_args()
+    os.environ['CORONA_RENDER_DIR'] = args.render_dir
+    results = run_dag(pipeline_stages(with_trend=not args.no_trend), args.workers)
+    # the exports ran in the workers, so the misspelled CORONA_EXPORTS names are found here
+    import CoronaExport
+    CoronaExport.report_unknown(set().union(*(results[script] for script in PRODUCERS)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import os
+import pandas as pd
+
+#
+# country reference table
+#   data/countries.csv holds one row per country keyed by ISO 3166 alpha-3 code (XKX for Kosovo),
+#   with the JHU spelling, the Worldometers spelling, other spellings seen in the JHU daily
+#   reports ('|' separated) and the 2020 population as published by Worldometers (UN WPP 2019).
+#   point CORONA_COUNTRIES at another file with the same columns to use different figures.
+#
+COUNTRIES_PATH = os.environ.get('CORONA_COUNTRIES',
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'countries.csv'))
+
+#
+# US state reference table
+#   data/states.csv holds the 2019 Census Bureau population estimate of every state, DC and
+#   territory under its JHU Province_State spelling (the figures the JHU US deaths series carries
+#   per county). point CORONA_STATES at another file with the same columns to use different figures.
+#
+STATES_PATH = os.environ.get('CORONA_STATES',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'states.csv'))
+
+
+def load_countries(path=COUNTRIES_PATH):
+    """
+    Returns the country reference table indexed by iso3.
+    """
+    countries = pd.read_csv(path, keep_default_na=False, dtype={'population': 'int64'})
+    return countries.set_index('iso3')
+
+
+def alias_map(countries):
+    """
+    Returns a spelling -> iso3 Series covering the canonical, JHU, Worldometers and extra
+    spellings (and the iso3 code itself), ready for Series.map.
+    """
+    table = countries.reset_index()
+    table['code'] = table['iso3']
+    table['aliases'] = table['aliases'].str.split('|')
+    spellings = table.explode('aliases').melt(id_vars='iso3', value_vars=['code', 'name', 'jhu', 'worldometers', 'aliases'],
+                                               value_name='spelling')
+    spellings = spellings[spellings['spelling'].fillna('') != ''].drop_duplicates('spelling')
+    return pd.Series(spellings['iso3'].to_numpy(), index=spellings['spelling'].to_numpy())
+
+
+def attach_population(df, region_column, countries=None):
+    """
+    Returns `df` with 'ISO3' and 'Population' columns joined in one merge through the alias map.
+    Regions without a match keep a NaN population and are listed, so none go missing unnoticed.
+    """
+    if countries is None:
+        countries = load_countries()
+    iso3 = df[region_column].map(alias_map(countries))
+    merged = df.assign(ISO3=iso3).merge(countries[['population']].rename(columns={'population': 'Population'}),
+                                        how='left', left_on='ISO3', right_index=True)
+    unmatched = merged.loc[merged['Population'].isna(), region_column].tolist()
+    if unmatched:
+        print('No population for: ' + ', '.join(str(region) for region in unmatched))
+    return merged
+
+
+def country_population(regions, countries=None):
+    """
+    Returns the population of every country in `regions` (any spelling the alias map knows),
+    indexed by `regions`, NaN for the ones without a match.
+    """
+    if countries is None:
+        countries = load_countries()
+    regions = pd.Index(regions)
+    population = regions.to_series().map(alias_map(countries)).map(countries['population'])
+    population.index = regions
+    population.name = 'population'
+    unmatched = population.index[population.isna()].tolist()
+    if unmatched:
+        print('No population for: ' + ', '.join(str(region) for region in unmatched))
+    return population.astype('float64')
+
+
+def load_states(path=STATES_PATH):
+    """
+    Returns the state population Series indexed by the JHU state name.
+    """
+    states = pd.read_csv(path, keep_default_na=False, dtype={'population': 'int64'})
+    return states.set_index('state')['population']
+
+
+def state_population(regions, states=None):
+    """
+    Returns the population of every state in `regions`, indexed by `regions`, NaN for the ones
+    the state table does not have (the cruise ships).
+    """
+    if states is None:
+        states = load_states()
+    return states.reindex(pd.Index(regions)).astype('float64')
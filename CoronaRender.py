@@ -0,0 +1,114 @@
+import atexit
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+import matplotlib.pyplot as plt
+
+#
+# headless batch rendering
+#   when CORONA_RENDER_DIR is set the scripts do not open any window: show() hands every open
+#   figure to a pool of worker processes (one figure per task) that write it to
+#   CORONA_RENDER_DIR/<script>-<chart>.<format> with the Agg backend, for each format in
+#   CORONA_RENDER_FORMATS (default png, e.g. png,svg). a chart title used again in the same
+#   script gets _2, _3, ... appended. without it show() is plt.show().
+#
+RENDER_DIR = os.environ.get('CORONA_RENDER_DIR', '')
+RENDER_FORMATS = [item.strip() for item in os.environ.get('CORONA_RENDER_FORMATS', 'png').split(',') if item.strip()]
+RENDER_WORKERS = int(os.environ.get('CORONA_RENDER_WORKERS', str(os.cpu_count() or 1)))
+
+if RENDER_DIR:
+    plt.switch_backend('Agg')
+
+_pool = None
+_pending = []
+# file stems handed out so far, so two figures with the same title do not overwrite each other
+_bases = set()
+
+
+def init_render_worker():
+    matplotlib.use('Agg')
+
+
+def save_figure(figure, base, formats=None):
+    """
+    Writes `figure` to <base>.<format> once per format (default CORONA_RENDER_FORMATS). Returns the paths written.
+    """
+    paths = []
+    for fmt in RENDER_FORMATS if formats is None else formats:
+        figure.savefig(base + '.' + fmt, format=fmt, bbox_inches='tight')
+        paths.append(base + '.' + fmt)
+    return paths
+
+
+def render_figure(data, base, formats):
+    """
+    Worker side: rebuilds a pickled figure and writes it once per format. Returns the paths written.
+    """
+    return save_figure(pickle.loads(data), base, formats)
+
+
+def file_stem(name):
+    return re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')
+
+
+def figure_name(figure):
+    """
+    Returns the file name stem of a figure: its label if it has one, otherwise its first axes title.
+    """
+    name = figure.get_label()
+    if not name:
+        titles = [ax.get_title() for ax in figure.axes if ax.get_title()]
+        name = titles[0] if titles else 'figure{0}'.format(figure.number)
+    return file_stem(name)
+
+
+def unique_base(base):
+    """
+    Returns `base`, or `base`_2, _3, ... if it was already used in this run.
+    """
+    candidate, count = base, 1
+    while candidate in _bases:
+        count += 1
+        candidate = '{0}_{1}'.format(base, count)
+    _bases.add(candidate)
+    return candidate
+
+
+def show(prefix):
+    """
+    Replaces plt.show(): with a display, shows the figures as before. In headless mode every
+    open figure is queued for rendering as <prefix>-<figure name> and closed, without waiting.
+    """
+    global _pool
+    if not RENDER_DIR:
+        plt.show()
+        return
+    os.makedirs(RENDER_DIR, exist_ok=True)
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=init_render_worker)
+    for number in plt.get_fignums():
+        figure = plt.figure(number)
+        base = unique_base(os.path.join(RENDER_DIR, prefix + '-' + figure_name(figure)))
+        _pending.append(_pool.submit(render_figure, pickle.dumps(figure), base, RENDER_FORMATS))
+        plt.close(figure)
+
+
+def finish():
+    """
+    Waits until every queued figure is written, shuts the render pool down and re-raises the
+    first rendering error. The atexit hook does not run in multiprocessing workers, so a
+    script run there (see CoronaPipeline.run_script) has to call this itself.
+    """
+    global _pool
+    try:
+        while _pending:
+            _pending.pop(0).result()
+    finally:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+atexit.register(finish)
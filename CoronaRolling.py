@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+
+#
+# rolling window statistics of every region at once
+#   RollingStats takes a dates x regions matrix of daily counts (e.g. the DifferenceTranspose
+#   artifact) and keeps one running sum down the date axis; every trailing window sum of every
+#   region is then a difference of two rows of it, whatever the window. the statistics built on
+#   those sums are computed the first time they are asked for and cached per (metric, window):
+#       mean, sum         trailing window mean / sum (NaN until the window is full or while it
+#                         holds a missing day, like rolling(window).mean())
+#       growth_rate       daily growth rate of the window sum against the window before it,
+#                         ln(sum / previous sum) / window
+#       doubling_time     days for the window sum to double at that rate (NaN when not growing)
+#       week_over_week    window sum / previous window sum (this week / last week for 7)
+#   CORONA_WINDOWS sets the windows summary() reports (default 7,14,28).
+#
+WINDOWS = [int(item) for item in os.environ.get('CORONA_WINDOWS', '7,14,28').split(',') if item.strip()]
+METRICS = ['mean', 'sum', 'growth_rate', 'doubling_time', 'week_over_week']
+
+
+class RollingStats:
+    """
+    Rolling window statistics of a dates x regions matrix of daily counts, for all regions in one pass.
+    """
+
+    def __init__(self, df):
+        self.index = df.index
+        self.columns = df.columns
+        values = df.to_numpy(dtype='float64')
+        missing = np.isnan(values)
+        zeros = np.zeros((1, values.shape[1]))
+        self.running = np.concatenate((zeros, np.cumsum(np.where(missing, 0.0, values), axis=0)))
+        self.running_missing = np.concatenate((zeros, np.cumsum(missing, axis=0)))
+        self._cache = {}
+
+    def get(self, metric, window=7):
+        """
+        Returns the dates x regions frame of `metric` (one of METRICS) over `window` days.
+        """
+        if metric not in METRICS:
+            raise ValueError('unknown rolling metric: ' + str(metric))
+        key = (metric, window)
+        if key not in self._cache:
+            values = getattr(self, '_' + metric)(window)
+            self._cache[key] = pd.DataFrame(values, index=self.index, columns=self.columns)
+        return self._cache[key]
+
+    def mean(self, window=7):
+        return self.get('mean', window)
+
+    def sum(self, window=7):
+        return self.get('sum', window)
+
+    def growth_rate(self, window=7):
+        return self.get('growth_rate', window)
+
+    def doubling_time(self, window=7):
+        return self.get('doubling_time', window)
+
+    def week_over_week(self, window=7):
+        return self.get('week_over_week', window)
+
+    def _sum(self, window):
+        totals = np.full((len(self.index), len(self.columns)), np.nan)
+        if 0 < window <= len(self.index):
+            totals[window - 1:] = self.running[window:] - self.running[:-window]
+            gaps = self.running_missing[window:] - self.running_missing[:-window]
+            totals[window - 1:][gaps > 0] = np.nan
+        return totals
+
+    def _mean(self, window):
+        return self.sum(window).to_numpy() / window
+
+    def _previous_sum(self, window):
+        """
+        Returns the window sums shifted down by one window, so each row sits next to the window before it.
+        """
+        sums = self.sum(window).to_numpy()
+        previous = np.full(sums.shape, np.nan)
+        previous[window:] = sums[:-window]
+        return sums, previous
+
+    def _week_over_week(self, window):
+        sums, previous = self._previous_sum(window)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = sums / previous
+        ratio[~np.isfinite(ratio)] = np.nan
+        return ratio
+
+    def _growth_rate(self, window):
+        ratio = self.week_over_week(window).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.log(ratio) / window
+        rate[~np.isfinite(rate)] = np.nan
+        return rate
+
+    def _doubling_time(self, window):
+        rate = self.growth_rate(window).to_numpy()
+        days = np.full(rate.shape, np.nan)
+        growing = rate > 0
+        days[growing] = np.log(2) / rate[growing]
+        return days
+
+    def summary(self, region, metrics=METRICS, windows=None):
+        """
+        Returns a dates x '<metric> <window>' frame for one region, e.g. 'mean 7', 'doubling_time 14'.
+        """
+        windows = WINDOWS if windows is None else windows
+        return pd.DataFrame({'{0} {1}'.format(metric, window): self.get(metric, window)[region]
+                             for metric in metrics for window in windows}, index=self.index)
+
+    def latest(self, metrics=METRICS, windows=None):
+        """
+        Returns a regions x '<metric> <window>' table of the last date, for every region.
+        """
+        windows = WINDOWS if windows is None else windows
+        return pd.DataFrame({'{0} {1}'.format(metric, window): self.get(metric, window).iloc[-1]
+                             for metric in metrics for window in windows}, index=self.columns)
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import matplotlib
+import numpy as np
+import pandas as pd
+from CoronaChartCache import CONTENT_TYPES, ChartCache, chart_key
+from CoronaRolling import RollingStats
+from CoronaStore import STORE_DIR, index_labels, read_frame, store_version
+from NationTrend import plot_data
+
+# charts are only ever rendered to bytes here
+matplotlib.use('Agg')
+
+#
+# dashboard backend
+#   a small asyncio HTTP server over the artifact store (see CoronaStore.py), for a web front end:
+#       GET /regions                                   {"nations": [...], "states": [...]}
+#       GET /series?region=Italy                       daily infections / deaths and their 7 day averages
+#       GET /series?region=Texas&kind=states&scale=per100k
+#       GET /chart?region=Italy[&kind=..][&scale=..][&format=svg]   NationTrend.py's chart as png (or svg)
+#       GET /stats?region=Italy[&kind=..][&scale=..]     every rolling statistic (see CoronaRolling.py) of the
+#                                                      daily infections / deaths, per date
+#       GET /stats[?kind=..][&scale=..]                  the same for the last date, for every region
+#   the artifacts are loaded once per data version (a new producer run changes it) with the 7 day
+#   averages of every region computed up front, on a loader thread: requests keep being answered
+#   from the previous version until the new one is ready and swapped in. encoded responses are
+#   kept in an in-memory LRU and carry an ETag of the data version, so a client that already has
+#   them gets a 304.
+#       CORONA_SERVER_CACHE   responses kept in memory (default 1024)
+#   charts come from the two tier chart cache (see CoronaChartCache.py) and are only rendered, on a
+#   single rendering thread, when the region's data changed.
+#   the store is checked for a new version at most once per VERSION_CHECK seconds.
+#
+SERVER_CACHE = int(os.environ.get('CORONA_SERVER_CACHE', '1024'))
+VERSION_CHECK = 1.0
+ARTIFACTS = {'nations': ('DifferenceTranspose', 'DifferenceTransposeDeaths'),
+             'states': ('StatesDifferenceTranspose', 'StatesDeathsDifferenceTranspose')}
+SCALES = {'counts': '', 'per100k': 'Per100k'}
+STATUS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+def artifact_names():
+    return [name + suffix for names in ARTIFACTS.values() for name in names for suffix in SCALES.values()]
+
+
+def json_values(series):
+    """
+    Returns a Series as a list with None for NaN, ready for json.dumps.
+    """
+    values = np.asarray(series, dtype='float64')
+    return [None if np.isnan(value) else value for value in values.tolist()]
+
+
+class SeriesData:
+    """
+    One version of the artifacts: both kinds at both scales, with their rolling stats.
+    """
+
+    def __init__(self, version, directory=STORE_DIR):
+        self.version = version
+        self.frames = {}
+        self.stats = {}
+        self.latest = {}
+        for kind, (infections_name, deaths_name) in ARTIFACTS.items():
+            for scale, suffix in SCALES.items():
+                try:
+                    infections = read_frame(infections_name + suffix, directory)
+                    deaths = read_frame(deaths_name + suffix, directory)
+                except FileNotFoundError:
+                    continue
+                stats = (RollingStats(infections), RollingStats(deaths))
+                self.frames[(kind, scale)] = (infections, deaths, stats[0].mean(7), stats[1].mean(7))
+                self.stats[(kind, scale)] = stats
+                # every metric and window up front, on the loader thread, so a request only picks them out
+                self.latest[(kind, scale)] = tuple(stat.latest() for stat in stats)
+
+    def regions(self):
+        return {kind: list(self.frames[(kind, 'counts')][0].columns) if (kind, 'counts') in self.frames else []
+                for kind in ARTIFACTS}
+
+    def has(self, kind, region, scale='counts'):
+        """
+        Returns True if there is data for `region` of `kind` at `scale`.
+        """
+        if (kind, scale) not in self.frames:
+            return False
+        infections, deaths = self.frames[(kind, scale)][:2]
+        return region in infections.columns and region in deaths.columns
+
+    def frame(self, kind, region, scale='counts'):
+        """
+        Returns one region's data in the shape NationTrend.plot_data() takes, or None if there is no such region.
+        """
+        if not self.has(kind, region, scale):
+            return None
+        infections, deaths, infections_average, deaths_average = self.frames[(kind, scale)]
+        return pd.DataFrame({"Infections": infections[region], "Deaths": deaths[region],
+                             "Infections 7 Day Average": infections_average[region],
+                             "Deaths 7 Day Average": deaths_average[region]}).fillna(0)
+
+    def series(self, kind, region, scale='counts'):
+        """
+        Returns the series of one region as a dict, or None if there is no such region.
+        """
+        if not self.has(kind, region, scale):
+            return None
+        infections, deaths, infections_average, deaths_average = self.frames[(kind, scale)]
+        return {'region': region, 'kind': kind, 'scale': scale, 'version': self.version,
+                'dates': index_labels(infections.index)[0],
+                'infections': json_values(infections[region]),
+                'deaths': json_values(deaths[region]),
+                'infections_average': json_values(infections_average[region]),
+                'deaths_average': json_values(deaths_average[region])}
+
+
+    def region_stats(self, kind, region, scale='counts'):
+        """
+        Returns every rolling statistic of one region per date as a dict, or None if there is no such region.
+        """
+        if not self.has(kind, region, scale):
+            return None
+        infections, deaths = self.stats[(kind, scale)]
+        return {'region': region, 'kind': kind, 'scale': scale, 'version': self.version,
+                'dates': index_labels(infections.index)[0],
+                'infections': {name: json_values(values) for name, values in infections.summary(region).items()},
+                'deaths': {name: json_values(values) for name, values in deaths.summary(region).items()}}
+
+    def latest_stats(self, kind, scale='counts'):
+        """
+        Returns every rolling statistic of the last date for every region as a dict, or None if there is no data.
+        """
+        if (kind, scale) not in self.latest:
+            return None
+        infections, deaths = self.latest[(kind, scale)]
+        dates = index_labels(self.stats[(kind, scale)][0].index)[0]
+        return {'kind': kind, 'scale': scale, 'version': self.version, 'date': dates[-1] if dates else None,
+                'metrics': list(infections.columns),
+                'infections': {region: json_values(row) for region, row in infections.iterrows()},
+                'deaths': {region: json_values(row) for region, row in deaths.iterrows()}}
+
+
+class ResponseCache:
+    """
+    Least recently used cache of encoded response bodies.
+    """
+
+    def __init__(self, max_entries=SERVER_CACHE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class CoronaServer:
+    """
+    Answers the dashboard requests from the current SeriesData, reloading it when the store changes.
+    """
+
+    def __init__(self, directory=STORE_DIR, cache_size=SERVER_CACHE):
+        self.directory = directory
+        self.cache = ResponseCache(cache_size)
+        self.charts = ChartCache()
+        # pyplot is not thread safe, so every chart is drawn on this one thread, off the event loop
+        self.renderer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+        # reading the artifacts and computing the averages takes a while, so it happens off the event loop
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='load')
+        self._data = None
+        self._loading = None
+        self._loading_version = None
+        self._checked = 0.0
+
+    async def data(self):
+        """
+        Returns the current SeriesData. Starts loading a new version in the background when the
+        store changed; only the very first request waits for a load.
+        """
+        now = time.monotonic()
+        if self._data is None or now - self._checked >= VERSION_CHECK:
+            self._checked = now
+            version = store_version(artifact_names(), self.directory)
+            current = self._loading_version if self._loading is not None else getattr(self._data, 'version', None)
+            if version != current:
+                self._loading_version = version
+                self._loading = asyncio.ensure_future(self.load(version))
+        if self._data is None:
+            await asyncio.shield(self._loading)
+        return self._data
+
+    async def load(self, version):
+        """
+        Loads `version` on the loader thread and swaps it in, unless a newer version was asked for meanwhile.
+        """
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(self.loader, SeriesData, version, self.directory)
+        except Exception as e:
+            if self._loading_version == version:
+                self._loading = None
+            if self._data is None:
+                raise
+            print('Could not load version {0}, still serving {1}: {2}'.format(version, self._data.version, e))
+            return
+        if self._loading_version == version:
+            self._data = data
+            self._loading = None
+            self.cache.entries.clear()
+
+    def chart(self, data, kind, region, scale, fmt):
+        """
+        Returns the image bytes of one region's chart, or None if there is no such region.
+        """
+        data_df = data.frame(kind, region, scale)
+        if data_df is None:
+            return None
+        unit = ' per 100k' if scale == 'per100k' else ''
+        key = chart_key('NationTrend', region if kind == 'nations' else 'US-' + region, scale, data_df)
+        return self.charts.charts(key, [fmt], lambda: plot_data(data_df, region + " Daily Infections & Deaths", unit))[fmt]
+
+    async def respond(self, method, target, headers):
+        """
+        Returns (status, extra headers, body) for one request.
+        """
+        if method not in ('GET', 'HEAD'):
+            return 405, {}, b''
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        data = await self.data()
+        etag = '"{0}"'.format(data.version)
+
+        if url.path == '/chart':
+            fmt = query.get('format', 'png')
+            if 'region' not in query or fmt not in CONTENT_TYPES:
+                return 400, {}, b'region and a format of ' + ', '.join(CONTENT_TYPES).encode() + b' are required'
+            kind, region, scale = query.get('kind', 'nations'), query['region'], query.get('scale', 'counts')
+            if not data.has(kind, region, scale):
+                return 404, {}, b'no such region'
+            # the client's copy is current: no need to even look the chart up
+            if headers.get('if-none-match') == etag:
+                return 304, {'ETag': etag}, b''
+            body = await asyncio.get_running_loop().run_in_executor(self.renderer, self.chart, data, kind, region,
+                                                                    scale, fmt)
+            return 200, {'ETag': etag, 'Content-Type': CONTENT_TYPES[fmt], 'Cache-Control': 'no-cache'}, body
+
+        key = (data.version, url.path, tuple(sorted(query.items())))
+        body = self.cache.get(key)
+        if body is None:
+            if url.path == '/regions':
+                payload = data.regions()
+            elif url.path == '/series':
+                if 'region' not in query:
+                    return 400, {}, b'region is required'
+                payload = data.series(query.get('kind', 'nations'), query['region'], query.get('scale', 'counts'))
+                if payload is None:
+                    return 404, {}, b'no such region'
+            elif url.path == '/stats':
+                if 'region' in query:
+                    payload = data.region_stats(query.get('kind', 'nations'), query['region'],
+                                                query.get('scale', 'counts'))
+                else:
+                    payload = data.latest_stats(query.get('kind', 'nations'), query.get('scale', 'counts'))
+                if payload is None:
+                    return 404, {}, b'no such region'
+            else:
+                return 404, {}, b''
+            body = json.dumps(payload, allow_nan=False).encode()
+            self.cache.put(key, body)
+        if headers.get('if-none-match') == etag:
+            return 304, {'ETag': etag}, b''
+        return 200, {'ETag': etag, 'Content-Type': 'application/json', 'Cache-Control': 'no-cache'}, body
+
+    async def handle(self, reader, writer):
+        """
+        Serves the requests of one connection (HTTP/1.1 keep-alive) until the client closes it.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(None, 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                status, extra, body = await self.respond(method, target, headers)
+                head = ['HTTP/1.1 {0} {1}'.format(status, STATUS[status]), 'Content-Length: ' + str(len(body))]
+                head += ['{0}: {1}'.format(name, value) for name, value in extra.items()]
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close' or version.strip() == 'HTTP/1.0':
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle, host, port)
+        print('Serving {0} on http://{1}:{2}'.format(self.directory, host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the per region series of the artifact store as JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+    asyncio.run(CoronaServer().serve(args.host, args.port))
+
+
+if __name__ == '__main__':
+    main()
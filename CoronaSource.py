@@ -0,0 +1,256 @@
+import csv
+import io
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+import pandas as pd
+from CoronaAggregate import DATE_COLUMN_PATTERN, parse_date_header
+from CoronaCache import download_cache
+
+#
+# data source layer: where the Johns Hopkins (JHU) csv files live and how they are read
+#   by default the raw files on GitHub; with CORONA_DATA_ROOT pointing at a local copy of
+#   csse_covid_19_data/ (csse_covid_19_time_series/ and csse_covid_19_daily_reports/ inside) every
+#   input is read from there instead and nothing is downloaded. the population tables are local
+#   files already (CORONA_COUNTRIES, CORONA_STATES, see CoronaRegions.py).
+#
+JHU_RAW_URL = 'https://raw.githubusercontent.com/CSSEGISandData/COVID-19/master/csse_covid_19_data/'
+DATA_ROOT = os.environ.get('CORONA_DATA_ROOT', '')
+
+# count columns of the daily reports, read as integers like the time series date columns
+DAILY_REPORT_COUNT_COLUMNS = ['Confirmed', 'Deaths', 'Recovered', 'Active']
+
+#
+# source checks
+#   every input is described by a SourceInput: its url, the content type the server must send and
+#   the header columns the scripts rely on (a tuple entry means any one of those names, for the
+#   renames between JHU report eras), plus whether it must have date columns. require_inputs()
+#   downloads them all, checks status, content type, size and header, and raises a SourceError
+#   before any aggregation starts instead of a traceback deep inside it.
+#       CORONA_MAX_INPUT_MB   largest input accepted (default 200)
+#
+# days a missing daily report is looked for further back (see latest_daily_report_day)
+REPORT_LOOKBACK = int(os.environ.get('CORONA_REPORT_LOOKBACK', '7'))
+MAX_INPUT_BYTES = int(os.environ.get('CORONA_MAX_INPUT_MB', '200')) * 1024 * 1024
+SourceInput = namedtuple('SourceInput', ['url', 'expected', 'columns', 'dates'], defaults=['text', (), False])
+TIME_SERIES_COLUMNS = {'confirmed_global': [('Country/Region', 'Country_Region')],
+                       'deaths_global': [('Country/Region', 'Country_Region')],
+                       'confirmed_US': ['Province_State'],
+                       'deaths_US': ['Province_State']}
+DAILY_REPORT_COLUMNS = [('Country_Region', 'Country/Region'), 'Confirmed', 'Deaths']
+
+
+class SourceError(Exception):
+    """
+    An input could not be fetched: `url` and a short `reason`.
+    """
+
+    def __init__(self, url, reason):
+        super().__init__('{0}: {1}'.format(url, reason))
+        self.url = url
+        self.reason = reason
+
+
+class SourceValidationError(SourceError):
+    """
+    An input was fetched but is not what the scripts expect (size, header).
+    """
+
+
+def data_location(relative):
+    """
+    Returns where the file at `relative` (below csse_covid_19_data/) is read from:
+    a path under CORONA_DATA_ROOT if set, else its raw GitHub url.
+    """
+    if DATA_ROOT:
+        return os.path.join(DATA_ROOT, *relative.split('/'))
+    return JHU_RAW_URL + relative
+
+
+def time_series_url(name):
+    """
+    Returns the raw csv url (or local path) of a JHU time series, e.g. name = 'confirmed_global' or 'deaths_US'.
+    """
+    return data_location('csse_covid_19_time_series/time_series_covid19_' + name + '.csv')
+
+
+def daily_report_url(day):
+    """
+    Returns the raw csv url (or local path) of the JHU daily report for `day` (a date or datetime).
+    """
+    return data_location('csse_covid_19_daily_reports/' + day.strftime('%m-%d-%Y') + '.csv')
+
+
+def time_series_input(name):
+    return SourceInput(time_series_url(name), 'text', TIME_SERIES_COLUMNS[name], True)
+
+
+def daily_report_input(day):
+    return SourceInput(daily_report_url(day), 'text', DAILY_REPORT_COLUMNS)
+
+
+def latest_daily_report_day(day=None, lookback=REPORT_LOOKBACK):
+    """
+    Returns `day` (yesterday by default) if its daily report can be fetched, else the latest of the
+    `lookback` days before it that can. Returns `day` itself when none can, so the input check
+    reports the missing report.
+    """
+    day = datetime.now() - timedelta(1) if day is None else day
+    for back in range(lookback + 1):
+        earlier = day - timedelta(back)
+        if download_cache().fetch(daily_report_url(earlier),
+                                  is_good=lambda resp: is_good_response(resp, expected='text')) is not None:
+            if back:
+                print('No daily report for {0:%m-%d-%Y} yet, using {1:%m-%d-%Y}'.format(day, earlier))
+            return earlier
+    return day
+
+
+def pipeline_inputs(day=None):
+    """
+    Returns the SourceInput of every remote input the 4 producer scripts read.
+    `day` is the daily report date, the latest published one by default like in the global scripts.
+    """
+    day = latest_daily_report_day() if day is None else day
+    return [daily_report_input(day)] + [time_series_input(name) for name in TIME_SERIES_COLUMNS]
+
+
+def prefetch(inputs):
+    """
+    Pulls every (url, expected, ...) input into the download cache, all at once on the fetch threads.
+    Returns the list of urls that could not be fetched.
+    """
+    paths = download_cache().fetch_many(
+        [(item[0], lambda resp, expected=item[1]: is_good_response(resp, expected=expected)) for item in inputs])
+    return [url for url, path in paths.items() if path is None]
+
+
+def check_file(source, path):
+    """
+    Raises SourceValidationError if the downloaded file of `source` is empty, too large,
+    or lacks one of its required header columns (or any date column).
+    """
+    size = os.path.getsize(path)
+    if size == 0 or size > MAX_INPUT_BYTES:
+        raise SourceValidationError(source.url, 'size {0} bytes outside 1..{1}'.format(size, MAX_INPUT_BYTES))
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader([f.readline()]), [])
+        if not f.readline().strip():
+            raise SourceValidationError(source.url, 'no data rows')
+    missing = [column if isinstance(column, str) else ' or '.join(column) for column in source.columns
+               if not set([column] if isinstance(column, str) else column) & set(header)]
+    if source.dates and not any(DATE_COLUMN_PATTERN.match(column) for column in header):
+        missing.append('date columns')
+    if missing:
+        raise SourceValidationError(source.url, 'missing ' + ', '.join(missing))
+
+
+def check_inputs(inputs):
+    """
+    Fetches every SourceInput concurrently and checks it.
+    Returns the list of SourceErrors, empty when all inputs are usable.
+    """
+    inputs = [SourceInput(*source) for source in inputs]
+    # each url is fetched once; a failed one is reported from the cache's error, not retried
+    paths = download_cache().fetch_many(
+        [(source.url, lambda resp, expected=source.expected: is_good_response(resp, expected=expected))
+         for source in inputs])
+    errors = []
+    for source in inputs:
+        path = paths[source.url]
+        try:
+            if path is None:
+                raise SourceError(source.url, download_cache().errors.get(source.url, 'not fetched'))
+            check_file(source, path)
+        except SourceError as e:
+            errors.append(e)
+    return errors
+
+
+def require_inputs(inputs):
+    """
+    Like check_inputs, but reports every bad input and raises the first one.
+    """
+    errors = check_inputs(inputs)
+    for e in errors:
+        log_error('{0}: {1}'.format(type(e).__name__, e))
+    if errors:
+        raise errors[0]
+
+
+#
+# functions to access web sites to scrape and confirm the web site is good
+#
+def simple_get(url):
+    """
+    Attempts to get the content at `url` by making an HTTP GET request.
+    If the content-type of response is some kind of HTML/XML, return the
+    text content, otherwise return None.
+    Goes through the download cache, so an unchanged page is not downloaded again.
+    """
+    path = download_cache().fetch(url, is_good=is_good_response)
+    if path is None:
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def is_good_response(resp, expected='html'):
+    """
+    Returns True if the response is a 200 whose content-type contains `expected` and whose
+    announced length (if any) is within MAX_INPUT_BYTES, False otherwise.
+    raw.githubusercontent.com serves csv files as text/plain, so csv callers pass expected='text'.
+    """
+    content_type = resp.headers.get('Content-Type', '').lower()
+    length = resp.headers.get('Content-Length', '')
+    return (resp.status_code == 200
+            and content_type.find(expected) > -1
+            and not (length.isdigit() and int(length) > MAX_INPUT_BYTES))
+
+
+def log_error(e):
+    """
+    It is always a good idea to log errors.
+    This function just prints them, but you can
+    make it do anything.
+    """
+    print(e)
+
+
+def csv_dtypes(columns, count_columns=()):
+    """
+    Returns the explicit dtype map for a JHU csv header: integers for every date column
+    and for the named count columns that are present. The nullable Int64 is used while
+    parsing so the odd blank cell does not abort the read.
+    """
+    return {column: 'Int64' for column in columns
+            if DATE_COLUMN_PATTERN.match(column) or column in count_columns}
+
+
+def parse_jhu_csv(stream, count_columns=(), **kwargs):
+    """
+    Parses a JHU csv from a binary stream. The header line is read first so the
+    date (and count) columns get explicit integer dtypes up front; blanks become 0
+    and those columns are handed back as plain int64, labelled with real dates.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    columns = next(csv.reader([text.readline()]))
+    dtypes = csv_dtypes(columns, count_columns)
+    df = pd.read_csv(text, header=None, names=columns, dtype=dtypes, **kwargs)
+    typed = list(dtypes)
+    df[typed] = df[typed].fillna(0).astype('int64')
+    df.columns = parse_date_header(columns)
+    return df
+
+
+def read_jhu_csv(url, count_columns=DAILY_REPORT_COUNT_COLUMNS, **kwargs):
+    """
+    Fetches the raw csv at `url` through the download cache and streams the
+    cached file into a typed DataFrame.
+    Raises SourceError if the download fails.
+    """
+    path = download_cache().fetch(url, is_good=lambda resp: is_good_response(resp, expected='text'))
+    if path is None:
+        raise SourceError(url, download_cache().errors.get(url, 'not fetched'))
+    with open(path, 'rb') as f:
+        return parse_jhu_csv(f, count_columns, **kwargs)
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from CoronaExport import export
+
+#
+# artifact store for the matrices the producer scripts hand to NationTrend.py
+#   every artifact is a plain .npy array (memory-mapped on read) plus a .json with its
+#   row (date) and column (region) labels, in CORONA_STORE_DIR (default ./corona_store).
+#   the old <name>.xlsx is an optional sink, written when the export is switched on (see CoronaExport.py).
+#   date labels are written as ISO yyyy-mm-dd strings and come back as a DatetimeIndex.
+#
+STORE_DIR = os.environ.get('CORONA_STORE_DIR', 'corona_store')
+
+
+def artifact_paths(name, directory=STORE_DIR):
+    base = os.path.join(directory, name)
+    return base + '.npy', base + '.json'
+
+
+def index_labels(index):
+    """
+    Returns (labels, True) with ISO date strings for a DatetimeIndex, else (labels as strings, False).
+    """
+    if isinstance(index, pd.DatetimeIndex):
+        return index.strftime('%Y-%m-%d').tolist(), True
+    return [str(label) for label in index], False
+
+
+def labels_index(labels, name, dates):
+    if dates:
+        return pd.DatetimeIndex(pd.to_datetime(labels, format='%Y-%m-%d'), name=name)
+    return pd.Index(labels, name=name)
+
+
+def write_frame(name, df, directory=STORE_DIR):
+    """
+    Stores `df` (one dtype, e.g. dates x regions) as artifact `name`.
+    Both files are written under temporary names first, so a reader never sees half an artifact.
+    """
+    os.makedirs(directory, exist_ok=True)
+    values_path, labels_path = artifact_paths(name, directory)
+    index, index_dates = index_labels(df.index)
+    columns, columns_dates = index_labels(df.columns)
+    labels = {'index': index,
+              'index_name': df.index.name,
+              'index_dates': index_dates,
+              'columns': columns,
+              'columns_name': df.columns.name,
+              'columns_dates': columns_dates}
+    with open(values_path + '.tmp', 'wb') as f:
+        np.save(f, np.ascontiguousarray(df.to_numpy()))
+    with open(labels_path + '.tmp', 'w') as f:
+        json.dump(labels, f)
+    os.replace(values_path + '.tmp', values_path)
+    os.replace(labels_path + '.tmp', labels_path)
+    export(name, df)
+
+
+def read_frame(name, directory=STORE_DIR):
+    """
+    Returns artifact `name` as a DataFrame backed by a read-only memory map of the .npy file.
+    """
+    values_path, labels_path = artifact_paths(name, directory)
+    with open(labels_path) as f:
+        labels = json.load(f)
+    values = np.load(values_path, mmap_mode='r')
+    return pd.DataFrame(values, copy=False,
+                        index=labels_index(labels['index'], labels['index_name'], labels.get('index_dates')),
+                        columns=labels_index(labels['columns'], labels['columns_name'], labels.get('columns_dates')))
+
+
+def store_version(names, directory=STORE_DIR):
+    """
+    Returns a short version string of the artifacts `names`, which changes whenever one of them is rewritten.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for name in names:
+        for path in artifact_paths(name, directory):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            digest.update('{0}:{1}:{2};'.format(path, stat.st_mtime_ns, stat.st_size).encode())
+    return digest.hexdigest()
@@ -1,17 +1,33 @@
+import argparse
+import json
 import pandas as pd
 import numpy as numpy
 import matplotlib.pyplot as plt
 from matplotlib.ticker import (MultipleLocator, FormatStrFormatter, AutoMinorLocator)
 import os
+from concurrent.futures import ProcessPoolExecutor
+from CoronaChartCache import ChartCache, chart_key
+from CoronaCharts import date_labels
+from CoronaPerCapita import PER_100K, UNIT
+from CoronaRender import RENDER_DIR, RENDER_FORMATS, file_stem, init_render_worker, show
+from CoronaRolling import RollingStats
+from CoronaStore import read_frame
 
 #
-# the following files need to be in same directory as this file.
-#       DifferenceTranspose.xlsx
-#       DifferenceTransposeDeaths.xlsx
-#       StatesDifferenceTranspose.xlsx
-#       StatesDeathsDifferenceTranspose.xlsx
+# the following artifacts need to be in the artifact store (see CoronaStore.py).
+#       DifferenceTranspose
+#       DifferenceTransposeDeaths
+#       StatesDifferenceTranspose
+#       StatesDeathsDifferenceTranspose
+# with CORONA_PER_100K=1 the per 100k versions (same names ending in Per100k) are read instead.
 #
-# these files are created by other 4 python scripts and need to run before this script.
+# these artifacts are created by other 4 python scripts and need to run before this script.
+#
+# run without arguments it asks for a country (and a state when the country is US) and shows its chart.
+# batch mode renders the chart of every listed region to files in parallel worker processes:
+#       python NationTrend.py --regions all --states all
+#       python NationTrend.py --regions Italy Spain --states "New York" --render-dir charts
+#       python NationTrend.py --config regions.json      ({"regions": [...] or "all", "states": [...] or "all"})
 #
 
 # function to align x origin for 2 y axis
@@ -24,8 +40,8 @@ def align_yaxis(ax1, v1, ax2, v2):
     miny, maxy = ax2.get_ylim()
     ax2.set_ylim(miny+dy, maxy+dy)
 
-# function to plot country data along with state/territory data when country == US
-def plot_data(data_df, is_US):
+# function to plot the data of one country or state/territory, returns the figure
+def plot_data(data_df, chart_title, unit=UNIT):
     #
     # define the plot object
     #
@@ -34,7 +50,7 @@ def plot_data(data_df, is_US):
     #
     # create the x tick marks (index) and the labels for the tick marks
     #
-    x_labels = list(data_df.index.values)
+    x_labels = date_labels(data_df.index)
     index = range(0, len(x_labels))
     #
     # associate the x tick marks with the x labels so the labels are not sorted alphabetically
@@ -79,22 +95,18 @@ def plot_data(data_df, is_US):
     infections_curve = ax1.plot(index, infections, label="Infections", color='g')
     #
     ax1.set_xlabel("Date")
-    ax1.set_ylabel("Infections")
+    ax1.set_ylabel("Infections" + unit)
     ax1.yaxis.label.set_color('g')
     ax1.tick_params(axis='y', colors='g')
     ax1.tick_params(axis='x', labelrotation=90, labelsize=6)
     ax1.grid(True, axis='y', which='major', color='g', linestyle='-', linewidth=1.5)
     ax2.grid(True, axis='y', which='major', color='black', linestyle=':', linewidth=0.5)
-    ax2.set_ylabel("Deaths")
+    ax2.set_ylabel("Deaths" + unit)
     ax2.yaxis.label.set_color("black")
     #
-    if (is_US == "Yes"):
-        chart_title = state + " Daily Infections & Deaths"
-    else: 
-        chart_title = nation + " Daily Infections & Deaths"
     plt.title(chart_title)
     align_yaxis(ax1, 0, ax2, 0)
-    plt.show()
+    return fig
 
 # function to gather user input for country to visualize along with state/territory when country == US
 def get_region(regions):
@@ -116,50 +128,146 @@ def get_region(regions):
     return region
 
 
-os.system('clear')
-
 #
-# read files created from other scripts containing global data
+# artifacts created from other scripts, read once per process: 'nations' for the global data,
+# 'states' for the US states/territories, each as (infections, deaths, infections stats, deaths stats)
 #
-global_infections_data_df = pd.read_excel("DifferenceTranspose.xlsx")
-global_deaths_data_df = pd.read_excel("DifferenceTransposeDeaths.xlsx")
-all_nations = list(global_deaths_data_df.columns)
-nation = get_region(all_nations)
+artifact_suffix = 'Per100k' if PER_100K else ''
+ARTIFACTS = {'nations': ('DifferenceTranspose', 'DifferenceTransposeDeaths'),
+             'states': ('StatesDifferenceTranspose', 'StatesDeathsDifferenceTranspose')}
+_artifacts = {}
 
-if nation == 'US':
-    state_infections_data_df = pd.read_excel("StatesDifferenceTranspose.xlsx")
-    state_deaths_data_df = pd.read_excel("StatesDeathsDifferenceTranspose.xlsx")
-    states_territories = list(state_infections_data_df.columns)
-    state = get_region(states_territories)
 
-#
-# create data frame to store data to be used for plotting
-#
-nation_data_df = pd.DataFrame()
-nation_data_df["Infections"] = global_infections_data_df[nation]
-nation_data_df["Deaths"] = global_deaths_data_df[nation]
+def load_artifacts(kind):
+    if kind not in _artifacts:
+        infections_data_df = read_frame(ARTIFACTS[kind][0] + artifact_suffix)
+        deaths_data_df = read_frame(ARTIFACTS[kind][1] + artifact_suffix)
+        _artifacts[kind] = (infections_data_df, deaths_data_df,
+                            RollingStats(infections_data_df), RollingStats(deaths_data_df))
+    return _artifacts[kind]
 
-#
-# calculate 7-day averages for data and convent NaN to zero
-#
-nation_data_df["Infections 7 Day Average"] = nation_data_df.rolling(window=7)["Infections"].mean()
-nation_data_df["Deaths 7 Day Average"] = nation_data_df.rolling(window=7)["Deaths"].mean()
-nation_data_df = nation_data_df.fillna(0)
 
-plot_data(nation_data_df, is_US="Not Necessarily")
+def region_data(kind, region):
+    """
+    Returns the infections, deaths and 7-day averages of one region for plot_data().
+    """
+    infections_data_df, deaths_data_df, infections_stats, deaths_stats = load_artifacts(kind)
+    data_df = pd.DataFrame()
+    data_df["Infections"] = infections_data_df[region]
+    data_df["Deaths"] = deaths_data_df[region]
+    #
+    # take the 7-day averages from the rolling stats of all regions (see CoronaRolling.py) and convent NaN to zero
+    #
+    data_df["Infections 7 Day Average"] = infections_stats.mean(7)[region]
+    data_df["Deaths 7 Day Average"] = deaths_stats.mean(7)[region]
+    return data_df.fillna(0)
+
 
-#
-# read state data only if nation == "US" up above.
-# do not change the nation value here.
-#
-if nation == "US":
-    state_data_df = pd.DataFrame()
-    state_data_df["Infections"] = state_infections_data_df[state]
-    state_data_df["Deaths"] = state_deaths_data_df[state]
+def region_label(kind, region):
+    # states are named US-<state> so that e.g. Georgia the state does not overwrite Georgia the country
+    return region if kind == 'nations' else 'US-' + region
+
+
+def region_figure(kind, region, data_df=None):
+    if data_df is None:
+        data_df = region_data(kind, region)
+    fig = plot_data(data_df, region + " Daily Infections & Deaths")
+    fig.set_label(region_label(kind, region))
+    return fig
+
+
+def interactive():
+    """
+    Asks for a country, and a state/territory when the country is US, and shows their charts.
+    """
+    os.system('clear')
+    nation = get_region(list(load_artifacts('nations')[1].columns))
+    if nation == 'US':
+        state = get_region(list(load_artifacts('states')[0].columns))
+    region_figure('nations', nation)
+    show('NationTrend')
+    #
+    # plot state data only if nation == "US" up above.
+    #
+    if nation == 'US':
+        region_figure('states', state)
+        show('NationTrend')
+
+
+_chart_cache = None
+
+
+def render_region(kind, region, directory):
+    """
+    Worker side: writes one region's chart to <directory>/NationTrend-<region>.<format>, rendering
+    it only if its data changed since it was last rendered (see CoronaChartCache.py).
+    """
+    global _chart_cache
+    if _chart_cache is None:
+        _chart_cache = ChartCache()
+    data_df = region_data(kind, region)
+    key = chart_key('NationTrend', region_label(kind, region), 'per100k' if PER_100K else 'counts', data_df)
+    images = _chart_cache.charts(key, RENDER_FORMATS, lambda: region_figure(kind, region, data_df))
+    base = os.path.join(directory, 'NationTrend-' + file_stem(region_label(kind, region)))
+    paths = []
+    for fmt, data in images.items():
+        with open(base + '.' + fmt, 'wb') as f:
+            f.write(data)
+        paths.append(base + '.' + fmt)
+    return paths
+
+
+def select_regions(requested, available):
+    """
+    Returns the requested regions ('all' for every one of them) and fails on names the artifacts do not have.
+    """
+    if not requested:
+        return []
+    if isinstance(requested, str):
+        # a single region may be given on its own, e.g. {"regions": "Italy"}
+        requested = [requested]
+    if 'all' in requested:
+        return list(available)
+    unknown = [region for region in requested if region not in available]
+    if unknown:
+        raise ValueError('unknown regions: ' + ', '.join(unknown))
+    return list(requested)
+
+
+def batch(regions, states, directory, workers=None):
+    """
+    Renders the chart of every country in `regions` and every US state/territory in `states` in parallel.
+    """
+    jobs = [('nations', region) for region in select_regions(regions, load_artifacts('nations')[1].columns)]
+    if states:
+        jobs += [('states', state) for state in select_regions(states, load_artifacts('states')[0].columns)]
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker) as pool:
+        futures = [pool.submit(render_region, kind, region, directory) for kind, region in jobs]
+        for future in futures:
+            future.result()
+    print('{0} charts written to {1}'.format(len(jobs), directory))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Daily infections & deaths chart per country and US state.')
+    parser.add_argument('--regions', nargs='+', help='countries to render, or all')
+    parser.add_argument('--states', nargs='+', help='US states/territories to render, or all')
+    parser.add_argument('--config', help='JSON file with "regions" and/or "states" lists (or "all")')
+    parser.add_argument('--render-dir', default=RENDER_DIR or 'charts', help='directory for the batch charts')
+    parser.add_argument('--workers', type=int, help='worker processes (default one per CPU)')
+    args = parser.parse_args(argv)
+    regions, states = args.regions, args.states
+    if args.config:
+        with open(args.config) as f:
+            config = json.load(f)
+        regions = regions or config.get('regions')
+        states = states or config.get('states')
+    if not regions and not states:
+        interactive()
+    else:
+        batch(regions, states, args.render_dir, args.workers)
 
-    state_data_df["Infections 7 Day Average"] = state_data_df.rolling(window=7)["Infections"].mean()
-    state_data_df["Deaths 7 Day Average"] = state_data_df.rolling(window=7)["Deaths"].mean()
-    state_data_df = state_data_df.fillna(0)
 
-    plot_data(state_data_df, is_US='Yes')
-  
+if __name__ == '__main__':
+    main()
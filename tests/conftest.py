@@ -0,0 +1,45 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# the modules are flat scripts at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import CoronaSource
+
+
+@pytest.fixture
+def global_table():
+    """
+    Returns a function building a raw JHU global time series table: a few provinces per country,
+    cumulative counts per date, e.g. global_table(pd.date_range('2020-01-22', periods=90)).
+    """
+    def build(dates, regions=('Italy', 'China', 'Chile', 'Peru'), provinces=3, seed=0):
+        rng = np.random.default_rng(seed)
+        rows = []
+        for region in regions:
+            for province in range(provinces):
+                daily = rng.poisson(rng.uniform(0, 50), len(dates)) * (np.arange(len(dates)) > rng.integers(0, len(dates)))
+                rows.append(['{0} {1}'.format(region, province), region, 1.0, 2.0] + list(np.cumsum(daily)))
+        columns = ['Province/State', 'Country/Region', 'Lat', 'Long'] + ['{d.month}/{d.day}/{d:%y}'.format(d=d) for d in dates]
+        return pd.DataFrame(rows, columns=columns)
+    return build
+
+
+@pytest.fixture
+def mirror(tmp_path, monkeypatch):
+    """
+    A local csse_covid_19_data directory that CoronaSource reads from (CORONA_DATA_ROOT).
+    Returns a function writing one time series into it, e.g. mirror('confirmed_global', table).
+    """
+    root = tmp_path / 'csse_covid_19_data'
+    (root / 'csse_covid_19_time_series').mkdir(parents=True)
+    (root / 'csse_covid_19_daily_reports').mkdir()
+    monkeypatch.setattr(CoronaSource, 'DATA_ROOT', str(root))
+
+    def write(name, table):
+        table.to_csv(root / 'csse_covid_19_time_series' / ('time_series_covid19_' + name + '.csv'), index=False)
+        return CoronaSource.time_series_url(name)
+    return write
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from CoronaAggregate import align_time_zero, sum_by_region
+from CoronaSource import read_jhu_csv
+
+
+def naive_align(df, threshold, values=None):
+    """
+    align_time_zero one region at a time with plain pandas.
+    """
+    values = df if values is None else values
+    aligned = {}
+    for region in df.columns:
+        crossed = np.flatnonzero(df[region].to_numpy() >= threshold)
+        if len(crossed):
+            aligned[region] = values[region].iloc[crossed[0]:].reset_index(drop=True).astype('float64')
+    return pd.DataFrame(aligned)
+
+
+def test_align_time_zero_matches_pandas(mirror, global_table):
+    df = read_jhu_csv(mirror('confirmed_global', global_table(pd.date_range('2020-01-22', periods=90))))
+    totals = sum_by_region(df, 'Country/Region', 'Country').transpose()
+    for threshold in (1, 500, 10 ** 9):
+        assert_frame_equal(align_time_zero(totals, threshold), naive_align(totals, threshold),
+                           check_index_type=False, check_column_type=False, check_names=False)
+    per_100k = totals / 3.0
+    assert_frame_equal(align_time_zero(totals, 500, values=per_100k), naive_align(totals, 500, per_100k),
+                       check_index_type=False, check_column_type=False, check_names=False)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from CoronaAggregate import sum_by_region
+from CoronaIncremental import IncrementalSeries
+from CoronaSource import read_jhu_csv
+
+
+def naive(df):
+    """
+    The full rebuild with plain pandas: totals per country, daily new counts, 7 day mean.
+    """
+    dates = [column for column in df.columns if isinstance(column, pd.Timestamp)]
+    totals = df.groupby('Country/Region', sort=False)[dates].sum().astype('float64')
+    totals.columns = pd.DatetimeIndex(dates)
+    daily = totals.T.diff().T
+    return totals, daily, daily.T.rolling(7).mean().T
+
+
+def update(series, df):
+    return series.update(df, 'Country/Region', lambda columns: sum_by_region(df, 'Country/Region', 'Country', columns))
+
+
+def test_incremental_update_matches_full_rebuild(mirror, global_table, tmp_path):
+    dates = pd.date_range('2020-01-22', periods=120)
+    table = global_table(dates)
+    series = IncrementalSeries('confirmed_global', 'test', enabled=True, directory=str(tmp_path / 'state'))
+
+    # first run on part of the history, then JHU appends days and revises an older one
+    update(series, read_jhu_csv(mirror('confirmed_global', table.iloc[:, :4 + 100])))
+    revised = table.copy()
+    revised.iloc[2, 4 + 50:] += 7
+    df = read_jhu_csv(mirror('confirmed_global', revised))
+    totals = update(series, df)
+
+    expected_totals, expected_daily, expected_average = naive(df)
+    assert isinstance(totals.columns, pd.DatetimeIndex)
+    assert_frame_equal(totals.astype('float64'), expected_totals, check_names=False)
+    assert_frame_equal(series.daily, expected_daily, check_names=False)
+    assert_frame_equal(series.average, expected_average, check_names=False)
+
+    # and a run without changes reuses everything
+    update(series, df)
+    assert_frame_equal(series.average, expected_average, check_names=False)
+
+
+def test_incremental_state_is_kept_per_producer(tmp_path):
+    first = IncrementalSeries('deaths_global', 'GlobalCoronaDailyInfections', enabled=True, directory=str(tmp_path))
+    second = IncrementalSeries('deaths_global', 'GlobalCoronaDailyDeaths', enabled=True, directory=str(tmp_path))
+    assert first.path != second.path
+    first.save({'totals': pd.DataFrame(np.ones((2, 2)))})
+    assert second.load() is None
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['GlobalCoronaDailyInfections.deaths_global.pkl']
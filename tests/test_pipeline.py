@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# a stage that queues a chart and then an export that cannot be written
+FAILING_SCRIPT = '''
+import matplotlib.pyplot as plt
+import pandas as pd
+import CoronaExport
+import CoronaRender
+CoronaRender.RENDER_DIR = {render_dir!r}
+CoronaExport.EXPORTS = 'all'
+plt.figure()
+plt.plot([1, 2, 3])
+plt.title('check')
+CoronaRender.show('failing')
+CoronaExport.export({export!r}, pd.DataFrame({{'a': [1]}}))
+'''
+
+
+def test_failing_export_fails_the_run(tmp_path):
+    script = tmp_path / 'failing.py'
+    script.write_text(FAILING_SCRIPT.format(render_dir=str(tmp_path / 'charts'),
+                                            export=str(tmp_path / 'no such dir' / 'Export')))
+    run = textwrap.dedent('''
+        import sys
+        sys.path.insert(0, {repo!r})
+        from CoronaPipeline import Stage, run_dag
+        run_dag([Stage('failing.py', {script!r}, [], False)], 1)
+    ''').format(repo=REPO, script=str(script))
+    # a stage whose export fails must stop the run with that error, not leave its worker hanging
+    result = subprocess.run([sys.executable, '-c', run], cwd=str(tmp_path), capture_output=True, text=True, timeout=120,
+                            env=dict(os.environ, MPLBACKEND='Agg'))
+    assert result.returncode != 0
+    assert 'Traceback' in result.stderr
+    assert os.path.exists(tmp_path / 'charts' / 'failing-check.png')
@@ -0,0 +1,14 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from CoronaAggregate import sum_by_region
+from CoronaRolling import RollingStats
+from CoronaSource import read_jhu_csv
+
+
+def test_rolling_matches_pandas(mirror, global_table):
+    df = read_jhu_csv(mirror('confirmed_global', global_table(pd.date_range('2020-01-22', periods=90))))
+    daily = sum_by_region(df, 'Country/Region', 'Country').transpose().diff()
+    stats = RollingStats(daily)
+    for window in (7, 14):
+        assert_frame_equal(stats.mean(window), daily.rolling(window).mean())
+        assert_frame_equal(stats.sum(window), daily.rolling(window).sum())
@@ -0,0 +1,44 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import CoronaCache
+from CoronaSource import SourceError, SourceInput, SourceValidationError, check_inputs
+
+FILES = {'/good.csv': b'Country/Region,1/22/20\nItaly,1\n',
+         '/no_dates.csv': b'Country/Region,Lat\nItaly,1\n'}
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        body = FILES.get(self.path)
+        self.send_response(404 if body is None else 200)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body or b'')))
+        self.end_headers()
+        self.wfile.write(body or b'')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setattr(CoronaCache, '_cache', CoronaCache.DownloadCache(directory=str(tmp_path / 'cache'), offline=False))
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+
+
+def test_check_inputs_fetches_every_url_once(server):
+    base = 'http://127.0.0.1:{0}'.format(server.server_address[1])
+    errors = check_inputs([SourceInput(base + '/good.csv', 'text', [('Country/Region', 'Country_Region')], True),
+                           SourceInput(base + '/no_dates.csv', 'text', ['Country/Region'], True),
+                           SourceInput(base + '/missing.csv', 'text')])
+    assert [(type(e), e.url) for e in errors] == [(SourceValidationError, base + '/no_dates.csv'),
+                                                  (SourceError, base + '/missing.csv')]
+    assert 'date columns' in errors[0].reason
+    assert '404' in errors[1].reason
+    assert sorted(server.requests) == ['/good.csv', '/missing.csv', '/no_dates.csv']
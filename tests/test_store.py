@@ -0,0 +1,18 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+from CoronaAggregate import sum_by_region
+from CoronaSource import read_jhu_csv
+from CoronaStore import read_frame, write_frame
+
+
+def test_store_round_trip(mirror, global_table, tmp_path):
+    df = read_jhu_csv(mirror('confirmed_global', global_table(pd.date_range('2020-01-22', periods=90))))
+    daily = sum_by_region(df, 'Country/Region', 'Country').transpose().diff()
+    write_frame('DifferenceTranspose', daily, str(tmp_path))
+    restored = read_frame('DifferenceTranspose', str(tmp_path))
+    assert isinstance(restored.index, pd.DatetimeIndex)
+    assert_frame_equal(restored, daily, check_names=False, check_freq=False)
+
+    counts = pd.DataFrame({'Alabama': [1, 2], 'Alaska': [3, 4]}, index=['a', 'b'])
+    write_frame('Counts', counts, str(tmp_path))
+    assert_frame_equal(read_frame('Counts', str(tmp_path)), counts, check_names=False)